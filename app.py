@@ -1,21 +1,29 @@
-from flask import Flask, render_template
+import hmac
+import os
+
+from flask import Flask, abort, render_template, jsonify, request
 from flask_sqlalchemy import SQLAlchemy
 from flask_migrate import Migrate
-from flask_session import Session
 
 
 from extensions import db
+from session_store import init_session_store
 
 migrate = Migrate()
 
 
-def create_app():
+def create_app(test_config=None):
     app = Flask(__name__)
 
     # --- Secret & session config ---
-    app.config["SECRET_KEY"] = "super-secret-key"
+    # Signs session cookies and the first-party session tokens; a guessable
+    # default would let anyone mint a token for any user
+    secret_key = os.getenv("SECRET_KEY")
+    if not secret_key:
+        raise RuntimeError("SECRET_KEY must be set")
+    app.config["SECRET_KEY"] = secret_key
     
-    app.config["SESSION_TYPE"] = "filesystem"
+    app.config["SESSION_TYPE"] = os.getenv("SESSION_TYPE", "sqlite")  # "sqlite" or "memory"
     app.config["SESSION_COOKIE_SECURE"] = True  # True only with HTTPS
 
     app.config["SESSION_COOKIE_SAMESITE"] = "Lax"
@@ -23,15 +31,69 @@ def create_app():
 
     app.config["SESSION_PERMANENT"] = False
     app.config["SESSION_USE_SIGNER"] = True
-    app.config["SESSION_FILE_DIR"] = "./flask_session"
+    app.config["SESSION_SQLITE_PATH"] = os.path.join(app.instance_path, "sessions.db")
+    app.config["SESSION_SWEEP_INTERVAL"] = 300
 
     app.config["SESSION_KEY_PREFIX"] = "session:"
     app.config["SESSION_SERIALIZATION_FORMAT"] = "json"
     
+    # --- First-party session tokens (HMAC-signed with SECRET_KEY) ---
+    app.config["SESSION_TOKEN_TTL"] = int(os.getenv("SESSION_TOKEN_TTL", 900))
+    app.config["REFRESH_TOKEN_TTL"] = int(os.getenv("REFRESH_TOKEN_TTL", 30 * 24 * 3600))
+
+    # --- Identity map (pi_uid -> user id, role, instructor id) ---
+    app.config["IDENTITY_CACHE_TTL"] = 300
+    app.config["IDENTITY_CACHE_STUDENT_TTL"] = 30
+
+    # --- Per-user entitlement sets ---
+    app.config["ENTITLEMENT_CACHE_TTL"] = 300
+
+    # --- Pi token verification cache ---
+    app.config["PI_TOKEN_CACHE_TTL"] = int(os.getenv("PI_TOKEN_CACHE_TTL", 300))
+    app.config["PI_TOKEN_CACHE_NEGATIVE_TTL"] = int(os.getenv("PI_TOKEN_CACHE_NEGATIVE_TTL", 10))
+    app.config["PI_TOKEN_CACHE_SIZE"] = int(os.getenv("PI_TOKEN_CACHE_SIZE", 4096))
+    app.config["PI_TOKEN_CACHE_PATH"] = os.getenv("PI_TOKEN_CACHE_PATH")  # SQLite file shared by workers
+
+    # --- Pi Platform API client ---
+    app.config["PI_API_KEY"] = os.getenv("apikey")
+    app.config["PI_API_CONNECT_TIMEOUT"] = 3.05
+    app.config["PI_API_READ_TIMEOUT"] = 10
+    app.config["PI_API_RETRIES"] = 2
+    app.config["PI_API_POOL_SIZE"] = 10
+
+    # --- Operational metrics (/api/metrics), disabled unless a scrape token is set ---
+    app.config["METRICS_TOKEN"] = os.getenv("METRICS_TOKEN")
+
+    # --- Public course response cache ---
+    app.config["RESPONSE_CACHE_SIZE"] = 512
+    app.config["RESPONSE_CACHE_TTL"] = int(os.getenv("RESPONSE_CACHE_TTL", 60))
+    # SQLite file shared by the workers so a version bump in one invalidates all; set empty for per-process
+    app.config["RESPONSE_CACHE_PATH"] = os.getenv("RESPONSE_CACHE_PATH", os.path.join(app.instance_path, "response_cache.db"))
+    app.config["PUBLIC_CACHE_CONTROL"] = "public, no-cache"  # browsers revalidate with If-None-Match
+
+    # --- Playback heartbeat write-behind buffer ---
+    app.config["PLAYBACK_BUFFER_SIZE"] = int(os.getenv("PLAYBACK_BUFFER_SIZE", 10000))  # positions held per worker
+    app.config["PLAYBACK_FLUSH_INTERVAL"] = int(os.getenv("PLAYBACK_FLUSH_INTERVAL", 5))  # seconds
+
+    # --- Catalog rankings (sort=top_rated, sort=trending) ---
+    app.config["RATING_PRIOR_MEAN"] = float(os.getenv("RATING_PRIOR_MEAN", 3.5))  # assumed rating of an unproven course
+    app.config["RATING_PRIOR_WEIGHT"] = int(os.getenv("RATING_PRIOR_WEIGHT", 10))  # ratings needed to outweigh it
+    app.config["TRENDING_HALF_LIFE_DAYS"] = float(os.getenv("TRENDING_HALF_LIFE_DAYS", 7))
+
+    # --- Certificate job queue ---
+    app.config["CERTIFICATE_WORKERS"] = int(os.getenv("CERTIFICATE_WORKERS", 2))  # render/upload threads per worker
+    app.config["CERTIFICATE_POLL_INTERVAL"] = 5  # seconds between scans for queued jobs
+    app.config["CERTIFICATE_JOB_TIMEOUT"] = 600  # seconds before a stalled job is queued again
+    app.config["CERTIFICATE_MAX_ATTEMPTS"] = 3
+    app.config["CERTIFICATE_AUTOSTART"] = True  # start the dispatcher on a worker's first request
+
     app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///data.db'
     app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    if test_config:
+        app.config.update(test_config)
     db.init_app(app)
     migrate.init_app(app, db)
+    init_session_store(app)
 
     # from models import User, Course, Lecture, Purchase, Progress, Certificate
     from routes.auth import bp as auth_bp
@@ -84,6 +146,25 @@ def create_app():
     def tou():
         return render_template('tou.html')
     
+    @app.route('/api/metrics')
+    def metrics_snapshot():
+        # Internal counters for operators only: hidden unless METRICS_TOKEN is set, then required
+        expected = app.config.get("METRICS_TOKEN")
+        if not expected:
+            abort(404)
+        supplied = request.headers.get("Authorization", "").removeprefix("Bearer ")
+        if not hmac.compare_digest(supplied.encode(), expected.encode()):
+            return jsonify({"error": "Unauthorized"}), 401
+        from routes.metrics import metrics
+        from routes.utils import token_cache, token_singleflight
+        from routes.playback import playback_buffer
+        from routes.certificate_jobs import certificate_queue_depth
+        data = metrics.snapshot()
+        data["pi_token_cache"] = dict(token_cache().stats(), coalesced=token_singleflight.coalesced)
+        data["playback_buffer"] = {"pending": playback_buffer().pending_count()}
+        data["certificate_queue"] = certificate_queue_depth()
+        return jsonify(data)
+
     @app.route('/validation-key.txt')
     def validation():
         return "550f621f9c2dee7dd2a7f98a3657cbc4b8d49879918e98daa3e89d05e2598a475fdbeaac5227d61c5afb2ff5ac0ce0e5c7855db65f4d5efaf6e3d15e3c5071c5"
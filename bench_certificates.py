@@ -0,0 +1,64 @@
+"""Micro-benchmark of certificate rendering, in certificates per second on one core.
+
+    python bench_certificates.py [count]
+
+"before" is the original renderer: a fresh ReportLab canvas per certificate
+saved to temp_certificates/ and read back for the upload. "after" is
+routes.certificate_render, which reuses a pre-built template and renders
+into memory. Uploads are not included.
+"""
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+from reportlab.pdfgen import canvas
+from reportlab.lib.pagesizes import A4
+
+from routes.certificate_render import render_certificate
+
+
+def render_with_canvas(directory, username, course_title, issued_at):
+    local_path = os.path.join(directory, "certificate.pdf")
+    c = canvas.Canvas(local_path, pagesize=A4)
+    c.setFont("Helvetica-Bold", 24)
+    c.drawCentredString(300, 700, "Certificate of Completion")
+    c.setFont("Helvetica", 16)
+    c.drawCentredString(300, 650, "This is to certify that")
+    c.setFont("Helvetica-Bold", 18)
+    c.drawCentredString(300, 610, username)
+    c.setFont("Helvetica", 16)
+    c.drawCentredString(300, 570, "has successfully completed the course:")
+    c.setFont("Helvetica-Bold", 18)
+    c.drawCentredString(300, 530, course_title)
+    c.setFont("Helvetica", 12)
+    c.drawCentredString(300, 480, f"Issued on {issued_at.strftime('%Y-%m-%d')}")
+    c.save()
+    with open(local_path, "rb") as f:
+        data = f.read()
+    os.remove(local_path)
+    return data
+
+
+def bench(name, render, count):
+    issued_at = datetime.utcnow()
+    render("warmup", "Warm-up course", issued_at)
+    start = time.perf_counter()
+    for i in range(count):
+        render(f"learner_{i}", f"Course number {i % 50}", issued_at)
+    elapsed = time.perf_counter() - start
+    print(f"{name:>7}: {count / elapsed:10.0f} certificates/s  ({elapsed / count * 1e6:.0f} us each)")
+    return count / elapsed
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    with tempfile.TemporaryDirectory() as directory:
+        before = bench("before", lambda *args: render_with_canvas(directory, *args), count)
+    after = bench("after", lambda *args: render_certificate(*args).getvalue(), count)
+    print(f"speedup: {after / before:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,42 @@
+"""course search index
+
+Revision ID: 8c1e4b2f9a07
+Revises: df5eaf9300e4
+Create Date: 2026-10-18 09:12:41.518203
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8c1e4b2f9a07'
+down_revision = 'df5eaf9300e4'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    dialect = op.get_bind().dialect.name
+    if dialect == 'sqlite':
+        op.execute(
+            "CREATE VIRTUAL TABLE courses_fts USING fts5("
+            "title, description, tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3')"
+        )
+        op.execute(
+            "INSERT INTO courses_fts (rowid, title, description) "
+            "SELECT id, title, coalesce(description, '') FROM courses"
+        )
+    elif dialect == 'postgresql':
+        op.execute(
+            "CREATE INDEX ix_courses_search ON courses USING gin "
+            "(to_tsvector('simple', title || ' ' || coalesce(description, '')))"
+        )
+
+
+def downgrade():
+    dialect = op.get_bind().dialect.name
+    if dialect == 'sqlite':
+        op.execute("DROP TABLE courses_fts")
+    elif dialect == 'postgresql':
+        op.execute("DROP INDEX ix_courses_search")
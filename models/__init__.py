@@ -44,9 +44,29 @@ class Course(db.Model):
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     library_id = db.Column(db.String(250))
     apikey = db.Column(db.String(250))
+
+    # Rating aggregates, adjusted by add_rating in the same transaction as the Rating row
+    rating_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    rating_sum = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    rating_hist_1 = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    rating_hist_2 = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    rating_hist_3 = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    rating_hist_4 = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    rating_hist_5 = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    # Catalog rankings, maintained by routes/rankings.py
+    rating_score = db.Column(db.Float, nullable=False, default=0, server_default='0')
+    trending_score = db.Column(db.Float, nullable=False, default=0, server_default='0')
     
     sections = db.relationship('Section', backref='course', lazy=True, order_by="Section.order")
 
+    __table_args__ = (
+        # Keyset pagination of the public catalog: WHERE is_published ORDER BY created_at, id
+        db.Index('ix_courses_published_created', 'is_published', 'created_at', 'id'),
+        # Ranked catalog pages: sort=top_rated and sort=trending
+        db.Index('ix_courses_published_rating', 'is_published', 'rating_score', 'id'),
+        db.Index('ix_courses_published_trending', 'is_published', 'trending_score', 'id'),
+    )
+
 class Lecture(db.Model):
     __tablename__ = 'lectures'
     id = db.Column(db.Integer, primary_key=True, autoincrement=True)
@@ -56,6 +76,10 @@ class Lecture(db.Model):
     duration = db.Column(db.Integer, default=0)
     order = db.Column(db.Integer, default=0)
 
+    __table_args__ = (
+        db.Index('ix_lectures_section_id', 'section_id'),
+    )
+
 class Purchase(db.Model):
     __tablename__ = 'purchases'
     id = db.Column(db.Integer, primary_key=True)
@@ -67,6 +91,24 @@ class Purchase(db.Model):
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     confirmed_at = db.Column(db.DateTime, nullable=True)
 
+    __table_args__ = (
+        db.Index('ix_purchases_user_course', 'user_id', 'course_id'),
+    )
+
+class Entitlement(db.Model):
+    """A user's right to a course, one row per (user, course) whichever purchase path granted it."""
+    __tablename__ = 'entitlements'
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id', name='fk_entitlement_user_id'), nullable=False)
+    course_id = db.Column(db.Integer, db.ForeignKey('courses.id', name='fk_entitlement_course_id'), nullable=False)
+    purchase_id = db.Column(db.Integer, db.ForeignKey('purchases.id', name='fk_entitlement_purchase_id'), nullable=True)
+    source = db.Column(db.String(30), default='purchase')
+    granted_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        db.UniqueConstraint('user_id', 'course_id', name='uq_entitlement_user_course'),
+    )
+
 class Progress(db.Model):
     __tablename__ = 'progress'
 
@@ -80,6 +122,38 @@ class Progress(db.Model):
     # Relationship
     user = db.relationship('User', back_populates='progress')
 
+    __table_args__ = (
+        db.UniqueConstraint('user_id', 'lecture_id', name='uq_progress_user_lecture'),
+        # Certificate eligibility: a user's completed lectures without touching the table
+        db.Index('ix_progress_user_completed', 'user_id', 'completed', 'lecture_id'),
+    )
+
+class CourseProgressSummary(db.Model):
+    """Per-(user, course) progress counters, kept in step with every Progress write."""
+    __tablename__ = 'course_progress_summary'
+
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id', name='fk_progress_summary_user_id'), primary_key=True)
+    course_id = db.Column(db.Integer, db.ForeignKey('courses.id', name='fk_progress_summary_course_id'), primary_key=True)
+    completed_count = db.Column(db.Integer, nullable=False, default=0)
+    total_lectures = db.Column(db.Integer, nullable=False, default=0)
+    last_lecture_id = db.Column(db.Integer, db.ForeignKey('lectures.id', name='fk_progress_summary_last_lecture_id'), nullable=True)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+class PlaybackPosition(db.Model):
+    """Where a user stopped in a lecture; written in batches by the heartbeat buffer."""
+    __tablename__ = 'playback_position'
+
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id', name='fk_playback_position_user_id'), primary_key=True)
+    lecture_id = db.Column(db.Integer, db.ForeignKey('lectures.id', name='fk_playback_position_lecture_id'), primary_key=True)
+    course_id = db.Column(db.Integer, db.ForeignKey('courses.id', name='fk_playback_position_course_id'), nullable=False)
+    position = db.Column(db.Float, nullable=False, default=0.0)  # seconds
+    duration = db.Column(db.Float, nullable=True)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        db.Index('ix_playback_position_user_course', 'user_id', 'course_id'),
+    )
+
 class Section(db.Model):
     __tablename__ = 'sections'
 
@@ -90,6 +164,22 @@ class Section(db.Model):
 
     lectures = db.relationship('Lecture', backref='section', lazy=True, order_by="Lecture.order")
 
+    __table_args__ = (
+        db.Index('ix_sections_course_id', 'course_id'),
+    )
+
+class CourseOutline(db.Model):
+    """Pre-serialized curriculum of a course, rewritten whenever its sections or lectures change."""
+    __tablename__ = 'course_outlines'
+
+    course_id = db.Column(db.Integer, db.ForeignKey('courses.id', name='fk_course_outline_course_id'), primary_key=True)
+    sections_json = db.Column(db.Text, nullable=False)  # [{id, title, order, lectures: [...]}]
+    lectures_json = db.Column(db.Text, nullable=False)  # flat lecture list in curriculum order
+    section_count = db.Column(db.Integer, default=0)
+    lecture_count = db.Column(db.Integer, default=0)
+    total_duration = db.Column(db.Integer, default=0)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow)
+
 class Certificate(db.Model):
     __tablename__ = 'certificates'
     id = db.Column(db.Integer, primary_key=True)
@@ -98,6 +188,31 @@ class Certificate(db.Model):
     pdf_url = db.Column(db.String(500))
     issued_at = db.Column(db.DateTime, default=datetime.utcnow)
 
+    __table_args__ = (
+        db.UniqueConstraint('user_id', 'course_id', name='uq_certificate_user_course'),
+    )
+
+class CertificateJob(db.Model):
+    """Queued issuance of one user's certificate for a course, run by routes/certificate_jobs.py."""
+    __tablename__ = 'certificate_jobs'
+
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id', name='fk_certificate_job_user_id'), nullable=False)
+    course_id = db.Column(db.Integer, db.ForeignKey('courses.id', name='fk_certificate_job_course_id'), nullable=False)
+    status = db.Column(db.String(20), nullable=False, default='queued')  # queued, rendering, uploading, done, failed
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    error = db.Column(db.String(500))
+    certificate_url = db.Column(db.String(500))
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        # Repeated requests for the same certificate collapse onto one job
+        db.UniqueConstraint('user_id', 'course_id', name='uq_certificate_job_user_course'),
+        # Claiming queued jobs and finding stalled ones
+        db.Index('ix_certificate_jobs_status', 'status', 'updated_at'),
+    )
+
 class Instructor(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), unique=True, nullable=False)
@@ -112,3 +227,9 @@ class Rating(db.Model):
     rating = db.Column(db.Integer, nullable=False)  # 1–5 stars
     review = db.Column(db.Text)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        db.UniqueConstraint('user_id', 'course_id', name='uq_rating_user_course'),
+        # Keyset pagination of reviews: WHERE course_id ORDER BY created_at DESC, id DESC
+        db.Index('ix_rating_course_created', 'course_id', 'created_at', 'id'),
+    )
@@ -1,7 +1,8 @@
-from flask import Blueprint, request, jsonify, session
+from flask import Blueprint, request, jsonify, session, current_app
 from extensions import db   
 from functools import wraps
 from .utils import verify_pi_token
+from .session_tokens import issue_session_token, issue_refresh_token, load_refresh_token
 
 bp = Blueprint('auth', __name__)
 
@@ -70,7 +71,8 @@ def pi_login():
         return jsonify({
             "success": True,
             "message": f"Welcome, {user.username}",
-            "user": {"id": user.id, "username": user.username}
+            "user": {"id": user.id, "username": user.username},
+            **_token_pair(user)
         })
     
     except Exception as e:
@@ -78,6 +80,32 @@ def pi_login():
         return jsonify({"error": "Server error. Check backend logs."}), 500
 
 
+@bp.route("/refresh", methods=["POST"])
+def refresh_session_token():
+    from models import User
+    data = request.get_json(force=True, silent=True)
+    if not isinstance(data, dict):
+        return jsonify({"error": "Expected a JSON object"}), 400
+    claims = load_refresh_token(data.get("refreshToken"))
+    if not claims:
+        return jsonify({"error": "Invalid or expired refresh token"}), 401
+
+    # Re-read the user so role changes are picked up on every refresh
+    user = User.query.get(claims["user_id"])
+    if not user:
+        return jsonify({"error": "User not found"}), 404
+
+    return jsonify({"success": True, **_token_pair(user)})
+
+
+def _token_pair(user):
+    return {
+        "sessionToken": issue_session_token(user),
+        "refreshToken": issue_refresh_token(user),
+        "expiresIn": current_app.config.get("SESSION_TOKEN_TTL", 900),
+    }
+
+
 @bp.route("/logout", methods=["POST"])
 def logout():
     session.clear()
@@ -0,0 +1,176 @@
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from datetime import datetime
+
+from sqlalchemy import and_, bindparam, insert as sa_insert, or_, update
+
+from extensions import db
+from .eligibility import completed_courses_query
+from .certificate_render import certificate_file_name, render_certificate, upload_certificate
+from .sql import upsert_insert
+
+
+def _eligible_page(after, limit, regenerate=False, course_id=None):
+    """One keyset page of ``(user_id, course_id, username, title, issued_at)`` for completed courses.
+
+    Eligibility comes from the grouped ``completed_courses_query``. ``issued_at``
+    is the existing certificate's date, or None; unless ``regenerate`` is set
+    only pairs without a certificate are returned.
+    """
+    from models import Certificate, Course, User
+    completed = completed_courses_query(course_ids=None if course_id is None else [course_id]).subquery()
+    query = (
+        db.session.query(completed.c.user_id, completed.c.course_id, User.username, Course.title, Certificate.issued_at)
+        .join(User, User.id == completed.c.user_id)
+        .join(Course, Course.id == completed.c.course_id)
+        .outerjoin(Certificate, and_(Certificate.user_id == completed.c.user_id,
+                                     Certificate.course_id == completed.c.course_id))
+    )
+    if not regenerate:
+        query = query.filter(Certificate.id.is_(None))
+    if after:
+        user_id, last_course_id = after
+        query = query.filter(or_(
+            completed.c.user_id > user_id,
+            and_(completed.c.user_id == user_id, completed.c.course_id > last_course_id),
+        ))
+    return query.order_by(completed.c.user_id, completed.c.course_id).limit(limit).all()
+
+
+def _render_pdf(args):
+    # Runs in a worker process; bytes pickle back cheaper than a BytesIO
+    username, course_title, issued_at = args
+    return render_certificate(username, course_title, issued_at).getvalue()
+
+
+def _upload(args):
+    file_name, pdf = args
+    return upload_certificate(file_name, pdf)
+
+
+def _load_checkpoint(path, options):
+    if not path or not os.path.exists(path):
+        return None
+    with open(path) as f:
+        checkpoint = json.load(f)
+    if checkpoint.get("options") != options:
+        raise ValueError(f"{path} was written by a backfill with different options; pass --restart to discard it")
+    return checkpoint
+
+
+def _save_checkpoint(path, checkpoint):
+    # Write-then-rename so an interrupt never leaves a truncated checkpoint
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(checkpoint, f)
+    os.replace(tmp_path, path)
+
+
+def backfill_certificates(checkpoint_path, regenerate=False, course_id=None, batch_size=200,
+                          render_workers=None, upload_workers=8, restart=False):
+    """Issue (or with ``regenerate`` re-issue) certificates for every eligible (user, course).
+
+    Pairs are processed in ``(user_id, course_id)`` order, a batch at a time:
+    PDFs are rendered on a process pool, pairs the job queue issued in the
+    meantime are dropped, the rest are uploaded by at most
+    ``upload_workers`` threads, new Certificate rows are bulk inserted
+    (skipping any that appear concurrently) and re-issued ones get their
+    URL updated in one executemany.
+    After each committed batch the last pair is written to the checkpoint
+    file, so an interrupted run resumes where it stopped; the file is
+    removed once the run completes. Re-issued certificates keep their
+    original date. Returns ``(issued, reissued, failed)``.
+    """
+    from models import Certificate
+    options = {"regenerate": regenerate, "course_id": course_id}
+    if restart and os.path.exists(checkpoint_path):
+        os.remove(checkpoint_path)
+    checkpoint = _load_checkpoint(checkpoint_path, options) or {"options": options, "after": None, "issued": 0, "failed": 0}
+    checkpoint.setdefault("reissued", 0)  # checkpoints written before re-issues were counted apart
+    if checkpoint["after"]:
+        print(f"[backfill] Resuming after user {checkpoint['after'][0]}, course {checkpoint['after'][1]}")
+
+    render_workers = render_workers or os.cpu_count() or 1
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=render_workers) as renderers, \
+            ThreadPoolExecutor(max_workers=upload_workers) as uploaders:
+        while True:
+            page = _eligible_page(checkpoint["after"], batch_size, regenerate, course_id)
+            db.session.rollback()  # release the read transaction while rendering and uploading
+            if not page:
+                break
+
+            now = datetime.utcnow()
+            pdfs = list(renderers.map(
+                _render_pdf,
+                [(username, title, issued_at or now) for _, _, username, title, issued_at in page],
+                chunksize=max(1, len(page) // (4 * render_workers)),
+            ))
+
+            # Drop pairs the job queue issued since the page was read, so the backfill
+            # does not upload over the queue's PDF with a different date
+            new_users = {user_id for user_id, _, _, _, issued_at in page if issued_at is None}
+            taken = set(
+                db.session.query(Certificate.user_id, Certificate.course_id)
+                .filter(Certificate.user_id.in_(new_users))
+                .all()
+            ) if new_users else set()
+            db.session.rollback()
+            work = [
+                (row, pdf) for row, pdf in zip(page, pdfs)
+                if row[4] is not None or (row[0], row[1]) not in taken
+            ]
+            urls = list(uploaders.map(
+                _upload,
+                ((certificate_file_name(user_id, cid), pdf) for (user_id, cid, _, _, _), pdf in work),
+            ))
+
+            rows = [
+                {"user_id": user_id, "course_id": cid, "pdf_url": url, "issued_at": now}
+                for ((user_id, cid, _, _, issued_at), _), url in zip(work, urls)
+                if url is not None and issued_at is None
+            ]
+            inserted = 0
+            if rows:
+                # The queue may still commit a pair after the check above; skip it rather than abort
+                insert = upsert_insert(Certificate)
+                if insert is not None:
+                    inserted = len(db.session.execute(
+                        insert.values(rows)
+                        .on_conflict_do_nothing(index_elements=["user_id", "course_id"])
+                        .returning(Certificate.id)
+                    ).all())
+                else:
+                    db.session.execute(sa_insert(Certificate), rows)
+                    inserted = len(rows)
+            reissued = [
+                {"u": user_id, "c": cid, "url": url}
+                for ((user_id, cid, _, _, issued_at), _), url in zip(work, urls)
+                if url is not None and issued_at is not None
+            ]
+            if reissued:
+                # Core statement: an ORM update with a parameter list would expect primary keys
+                certificates = Certificate.__table__
+                db.session.execute(
+                    update(certificates)
+                    .where(certificates.c.user_id == bindparam("u"), certificates.c.course_id == bindparam("c"))
+                    .values(pdf_url=bindparam("url")),
+                    reissued,
+                )
+            db.session.commit()
+
+            checkpoint["after"] = [page[-1][0], page[-1][1]]
+            checkpoint["issued"] += inserted
+            checkpoint["reissued"] += len(reissued)
+            checkpoint["failed"] += sum(1 for url in urls if url is None)
+            _save_checkpoint(checkpoint_path, checkpoint)
+            elapsed = time.perf_counter() - start
+            print(f"[backfill] {checkpoint['issued']} issued, {checkpoint['reissued']} re-issued, "
+                  f"{checkpoint['failed']} failed ({len(page) / elapsed if elapsed else 0:.0f}/s last batch)")
+            start = time.perf_counter()
+
+    if os.path.exists(checkpoint_path):
+        os.remove(checkpoint_path)
+    return checkpoint["issued"], checkpoint["reissued"], checkpoint["failed"]
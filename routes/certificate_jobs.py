@@ -0,0 +1,248 @@
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+from flask import current_app
+from sqlalchemy import or_, update
+
+from extensions import db
+from .certificate_render import certificate_file_name, render_certificate, upload_certificate
+from .metrics import metrics
+from .sql import upsert_insert
+
+# queued -> rendering -> uploading -> done, or back to queued until attempts run out -> failed
+ACTIVE_STATUSES = ('rendering', 'uploading')
+FINISHED_STATUSES = ('done', 'failed')
+RETRY_DELAY = 30  # seconds before a failed attempt is picked up again
+
+
+def enqueue_certificate(user_id, course_id):
+    """Return the job issuing a user's certificate for a course, creating it if needed.
+
+    There is one job row per (user, course), so repeated requests collapse
+    onto the job already queued or running; a finished job is queued again.
+    Commits, then wakes the dispatcher.
+    """
+    from models import CertificateJob
+    now = datetime.utcnow()
+    values = dict(user_id=user_id, course_id=course_id, status='queued', attempts=0, created_at=now, updated_at=now)
+    insert = upsert_insert(CertificateJob)
+    if insert is not None:
+        db.session.execute(insert.values(**values).on_conflict_do_nothing(index_elements=["user_id", "course_id"]))
+
+    job = CertificateJob.query.filter_by(user_id=user_id, course_id=course_id).first()
+    if job is None:
+        job = CertificateJob(**values)
+        db.session.add(job)
+    elif job.status in FINISHED_STATUSES:
+        job.status = 'queued'
+        job.attempts = 0
+        job.error = None
+        job.updated_at = now
+    db.session.commit()
+    certificate_queue().wake()
+    return job
+
+
+class CertificateQueue:
+    """Runs queued certificate jobs on a small thread pool.
+
+    Jobs live in the ``certificate_jobs`` table, so nothing is lost when a
+    worker restarts: a dispatcher thread claims queued rows with a
+    conditional UPDATE (safe across processes), and puts jobs that have been
+    rendering or uploading for longer than ``job_timeout`` seconds back in
+    the queue, which covers workers that died mid-job. Failed or timed-out
+    attempts are retried until ``max_attempts``, then the job is failed.
+    """
+
+    def __init__(self, app, workers=2, poll_interval=5, job_timeout=600, max_attempts=3):
+        self.app = app
+        self.workers = workers
+        self.poll_interval = poll_interval
+        self.job_timeout = job_timeout
+        self.max_attempts = max_attempts
+        self._wake = threading.Event()
+        self._lock = threading.Lock()
+        self._running = 0
+        self._pool = None
+        self._dispatcher_pid = None
+        self._start_lock = threading.Lock()
+
+    @classmethod
+    def from_config(cls, app):
+        return cls(
+            app,
+            workers=app.config.get("CERTIFICATE_WORKERS", 2),
+            poll_interval=app.config.get("CERTIFICATE_POLL_INTERVAL", 5),
+            job_timeout=app.config.get("CERTIFICATE_JOB_TIMEOUT", 600),
+            max_attempts=app.config.get("CERTIFICATE_MAX_ATTEMPTS", 3),
+        )
+
+    def start(self):
+        # One dispatcher per worker process; started lazily so it survives gunicorn's fork.
+        # Checked again under the lock so concurrent first requests start only one.
+        if self._dispatcher_pid == os.getpid():
+            return
+        with self._start_lock:
+            if self._dispatcher_pid == os.getpid():
+                return
+            self._running = 0
+            self._pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="certificate")
+            threading.Thread(target=self._dispatch_forever, name="certificate-dispatcher", daemon=True).start()
+            self._dispatcher_pid = os.getpid()
+
+    def wake(self):
+        self.start()
+        self._wake.set()
+
+    def _dispatch_forever(self):
+        while True:
+            self._wake.clear()
+            try:
+                with self.app.app_context():
+                    self._requeue_stale()
+                    with self._lock:
+                        free = self.workers - self._running
+                    for job_id in self._claim(free):
+                        with self._lock:
+                            self._running += 1
+                        self._pool.submit(self._run, job_id)
+            except Exception as e:
+                # Keep dispatching: a dead dispatcher would strand every queued job
+                print(f"[certificates] Dispatch failed: {e}")
+            self._wake.wait(self.poll_interval)
+
+    def _requeue_stale(self):
+        from models import CertificateJob
+        cutoff = datetime.utcnow() - timedelta(seconds=self.job_timeout)
+        stale = (CertificateJob.status.in_(ACTIVE_STATUSES), CertificateJob.updated_at < cutoff)
+        # Plain read first so an idle poll never opens a write transaction
+        if not db.session.query(db.session.query(CertificateJob.id).filter(*stale).exists()).scalar():
+            db.session.rollback()
+            return
+        now = datetime.utcnow()
+        failed = db.session.execute(
+            update(CertificateJob)
+            .where(*stale, CertificateJob.attempts >= self.max_attempts)
+            .values(status='failed', error="Timed out", updated_at=now)
+            .execution_options(synchronize_session=False)
+        ).rowcount
+        requeued = db.session.execute(
+            update(CertificateJob)
+            .where(*stale)
+            .values(status='queued', updated_at=now)
+            .execution_options(synchronize_session=False)
+        ).rowcount
+        db.session.commit()
+        if failed:
+            metrics.incr("certificates.failed", failed)
+        if requeued:
+            metrics.incr("certificates.requeued", requeued)
+
+    def _claim(self, limit):
+        from models import CertificateJob
+        if limit <= 0:
+            return []
+        retry_cutoff = datetime.utcnow() - timedelta(seconds=RETRY_DELAY)
+        candidates = (
+            db.session.query(CertificateJob.id)
+            .filter(
+                CertificateJob.status == 'queued',
+                or_(CertificateJob.attempts == 0, CertificateJob.updated_at < retry_cutoff),
+            )
+            .order_by(CertificateJob.updated_at, CertificateJob.id)
+            .limit(limit)
+            .all()
+        )
+        claimed = []
+        for job_id, in candidates:
+            # Another process may have claimed it since the SELECT
+            result = db.session.execute(
+                update(CertificateJob)
+                .where(CertificateJob.id == job_id, CertificateJob.status == 'queued')
+                .values(status='rendering', attempts=CertificateJob.attempts + 1, updated_at=datetime.utcnow())
+                .execution_options(synchronize_session=False)
+            )
+            if result.rowcount:
+                claimed.append(job_id)
+        db.session.commit()
+        return claimed
+
+    def _run(self, job_id):
+        start = time.perf_counter()
+        try:
+            with self.app.app_context():
+                try:
+                    _issue_certificate(job_id)
+                    metrics.incr("certificates.issued")
+                except Exception as e:
+                    db.session.rollback()
+                    print(f"[certificates] Job {job_id} failed: {e}")
+                    self._fail(job_id, str(e))
+        finally:
+            metrics.observe("certificates.job", time.perf_counter() - start)
+            with self._lock:
+                self._running -= 1
+            self._wake.set()
+
+    def _fail(self, job_id, error):
+        from models import CertificateJob
+        job = db.session.get(CertificateJob, job_id)
+        if job is None:
+            return
+        job.status = 'failed' if job.attempts >= self.max_attempts else 'queued'
+        job.error = error[:500]
+        job.updated_at = datetime.utcnow()
+        db.session.commit()
+        metrics.incr(f"certificates.{'failed' if job.status == 'failed' else 'retried'}")
+
+
+def _issue_certificate(job_id):
+    from models import Certificate, CertificateJob, Course, User
+    job = db.session.get(CertificateJob, job_id)
+    username, course_title = (
+        db.session.query(User.username, Course.title)
+        .join(Course, Course.id == job.course_id)
+        .filter(User.id == job.user_id)
+        .one()
+    )
+    pdf = render_certificate(username, course_title, datetime.utcnow())
+
+    job.status = 'uploading'
+    job.updated_at = datetime.utcnow()
+    db.session.commit()
+
+    url = upload_certificate(certificate_file_name(job.user_id, job.course_id), pdf)
+    if url is None:
+        raise RuntimeError("Failed to upload to Bunny.net")
+
+    if not Certificate.query.filter_by(user_id=job.user_id, course_id=job.course_id).first():
+        db.session.add(Certificate(user_id=job.user_id, course_id=job.course_id, pdf_url=url))
+    job.status = 'done'
+    job.certificate_url = url
+    job.error = None
+    job.updated_at = datetime.utcnow()
+    db.session.commit()
+
+
+def certificate_queue():
+    queue = current_app.extensions.get("certificate_queue")
+    if queue is None:
+        queue = current_app.extensions.setdefault(
+            "certificate_queue", CertificateQueue.from_config(current_app._get_current_object())
+        )
+    return queue
+
+
+def certificate_queue_depth():
+    """``{status: count}`` of unfinished certificate jobs."""
+    from models import CertificateJob
+    rows = (
+        db.session.query(CertificateJob.status, db.func.count())
+        .filter(CertificateJob.status.notin_(FINISHED_STATUSES))
+        .group_by(CertificateJob.status)
+        .all()
+    )
+    return dict(rows)
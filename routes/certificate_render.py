@@ -0,0 +1,124 @@
+import io
+import os
+
+import requests
+from reportlab.lib.pagesizes import A4
+from reportlab.pdfbase import pdfmetrics
+
+STORAGE_ZONE = os.getenv("STORAGE_ZONE", "thumbnailspilearn")
+ACCESS_KEY = os.getenv("ACCESS_KEY", "0ba2a024-c7dc-423d-a4f9cb83c4cf-f9ff-41cf")
+CDN_BASE_URL = os.getenv("CDN_BASE_URL", "https://learnpi.b-cdn.net")
+
+UPLOAD_TIMEOUT = (3.05, 30)  # connect, read
+
+PAGE_WIDTH, PAGE_HEIGHT = A4
+CENTER_X = 300
+
+# Text every certificate shares: (font, size, baseline y, text)
+STATIC_LINES = (
+    ("Helvetica-Bold", 24, 700, "Certificate of Completion"),
+    ("Helvetica", 16, 650, "This is to certify that"),
+    ("Helvetica", 16, 570, "has successfully completed the course:"),
+)
+FONT_NAMES = {"Helvetica": "F1", "Helvetica-Bold": "F2"}
+
+
+def certificate_file_name(user_id, course_id):
+    return f"certificate_{user_id}_{course_id}.pdf"
+
+
+def _pdf_string(text):
+    # Standard fonts use WinAnsiEncoding; characters outside it print as '?'
+    raw = text.encode("cp1252", errors="replace")
+    return b"(" + raw.replace(b"\\", b"\\\\").replace(b"(", b"\\(").replace(b")", b"\\)").replace(b"\r", b"").replace(b"\n", b" ") + b")"
+
+
+def _centred_text(font, size, y, text):
+    """Content-stream operators drawing ``text`` centred like ``canvas.drawCentredString``."""
+    x = CENTER_X - pdfmetrics.stringWidth(text, font, size) / 2
+    return b"BT /%s %d Tf %.2f %d Td %s Tj ET\n" % (FONT_NAMES[font].encode(), size, x, y, _pdf_string(text))
+
+
+def _pdf_object(number, body, stream=None):
+    if stream is None:
+        return b"%d 0 obj\n%s\nendobj\n" % (number, body)
+    return b"%d 0 obj\n%s /Length %d >>\nstream\n%s\nendstream\nendobj\n" % (number, body, len(stream), stream)
+
+
+class CertificateTemplate:
+    """Certificate PDF whose static layout is built once per process.
+
+    The fixed headings are drawn into a form XObject, and every object of the
+    file except the page's own content stream (catalog, page tree, page,
+    fonts and the form) is serialized up front together with its xref
+    offsets. Rendering a certificate then only writes the name, course
+    title and date plus the cross-reference table, with no canvas and no
+    temporary file.
+    """
+
+    def __init__(self):
+        form = b"".join(_centred_text(*line) for line in STATIC_LINES)
+        resources = b"/Resources << /Font << /F1 4 0 R /F2 5 0 R >> /XObject << /Layout 6 0 R >> >>"
+        objects = [
+            _pdf_object(1, b"<< /Type /Catalog /Pages 2 0 R >>"),
+            _pdf_object(2, b"<< /Type /Pages /Kids [3 0 R] /Count 1 >>"),
+            _pdf_object(3, b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 %.4f %.4f] %s /Contents 7 0 R >>"
+                        % (PAGE_WIDTH, PAGE_HEIGHT, resources)),
+            _pdf_object(4, b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica /Encoding /WinAnsiEncoding >>"),
+            _pdf_object(5, b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica-Bold /Encoding /WinAnsiEncoding >>"),
+            _pdf_object(6, b"<< /Type /XObject /Subtype /Form /BBox [0 0 %.4f %.4f] /Resources << /Font << /F1 4 0 R /F2 5 0 R >> >>"
+                        % (PAGE_WIDTH, PAGE_HEIGHT), form),
+        ]
+        self.prefix = b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n"
+        self.offsets = []
+        for obj in objects:
+            self.offsets.append(len(self.prefix))
+            self.prefix += obj
+        self.xref_head = b"xref\n0 8\n0000000000 65535 f \n" + b"".join(b"%010d 00000 n \n" % o for o in self.offsets)
+
+    def render(self, username, course_title, issued_at, out):
+        """Write one certificate to the binary stream ``out``."""
+        content = b"q /Layout Do Q\n" + b"".join([
+            _centred_text("Helvetica-Bold", 18, 610, username),
+            _centred_text("Helvetica-Bold", 18, 530, course_title),
+            _centred_text("Helvetica", 12, 480, f"Issued on {issued_at.strftime('%Y-%m-%d')}"),
+        ])
+        contents = _pdf_object(7, b"<<", content)
+        out.write(self.prefix)
+        out.write(contents)
+        out.write(self.xref_head)
+        out.write(b"%010d 00000 n \n" % len(self.prefix))
+        out.write(b"trailer\n<< /Size 8 /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(self.prefix) + len(contents)))
+
+
+_template = None
+
+
+def render_certificate(username, course_title, issued_at):
+    """Render a certificate of completion into a rewound in-memory PDF stream."""
+    global _template
+    if _template is None:
+        _template = CertificateTemplate()
+    buffer = io.BytesIO()
+    _template.render(username, course_title, issued_at, buffer)
+    buffer.seek(0)
+    return buffer
+
+
+def upload_certificate(file_name, pdf):
+    """Upload a rendered certificate (bytes or a file-like stream) to Bunny storage.
+
+    Returns its CDN URL, or None on failure.
+    """
+    bunny_url = f"https://storage.bunnycdn.com/{STORAGE_ZONE}/certificates/{file_name}"
+    headers = {"AccessKey": ACCESS_KEY, "Content-Type": "application/octet-stream"}
+    try:
+        response = requests.put(bunny_url, headers=headers, data=pdf, timeout=UPLOAD_TIMEOUT)
+    except requests.RequestException as e:
+        print(f"[certificates] Upload of {file_name} failed: {e}")
+        return None
+
+    if response.status_code not in (200, 201):
+        print(f"[certificates] Upload of {file_name} failed: HTTP {response.status_code}")
+        return None
+    return f"{CDN_BASE_URL}/certificates/{file_name}"
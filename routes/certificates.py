@@ -1,106 +1,128 @@
-from flask import Blueprint, request, jsonify, send_file
-from extensions import db
 import os
 
-
-import requests
-from reportlab.pdfgen import canvas
-from reportlab.lib.pagesizes import A4
-from datetime import datetime
+import click
+from flask import Blueprint, current_app, request, jsonify
+from sqlalchemy import and_
+from extensions import db
 
 from .utils import verify_pi_token  # Add this import
+from .identity import resolve_identity
+from .eligibility import completed_courses, completed_courses_query, is_eligible
+from .certificate_jobs import certificate_queue, enqueue_certificate
+from .certificate_backfill import backfill_certificates
 
 bp = Blueprint('certificates', __name__)
 
-STORAGE_ZONE = os.getenv("STORAGE_ZONE")
-ACCESS_KEY = os.getenv("ACCESS_KEY")
-CDN_BASE_URL = os.getenv("CDN_BASE_URL")
 
-import os
-import requests
-from reportlab.pdfgen import canvas
-from reportlab.lib.pagesizes import A4
-from datetime import datetime
+@bp.before_app_request
+def start_certificate_queue():
+    # Picks up jobs left queued by a previous run as soon as this worker serves a request
+    if current_app.config.get("CERTIFICATE_AUTOSTART", True):
+        certificate_queue().start()
+
+
+@bp.cli.command("backfill")
+@click.option("--regenerate", is_flag=True, help="Re-render certificates that already exist, e.g. after a rebrand.")
+@click.option("--course-id", type=int, help="Only this course.")
+@click.option("--batch-size", default=200, show_default=True)
+@click.option("--render-workers", type=int, help="Rendering processes  [default: CPU count]")
+@click.option("--upload-workers", default=8, show_default=True, help="Concurrent uploads.")
+@click.option("--checkpoint", "checkpoint_path", type=click.Path(dir_okay=False),
+              help="Progress file  [default: instance/certificate_backfill.json]")
+@click.option("--restart", is_flag=True, help="Ignore an existing checkpoint and start over.")
+def backfill_command(regenerate, course_id, batch_size, render_workers, upload_workers, checkpoint_path, restart):
+    """Issue certificates for every eligible learner; safe to interrupt and rerun."""
+    checkpoint_path = checkpoint_path or os.path.join(current_app.instance_path, "certificate_backfill.json")
+    try:
+        issued, reissued, failed = backfill_certificates(
+            checkpoint_path, regenerate=regenerate, course_id=course_id, batch_size=batch_size,
+            render_workers=render_workers, upload_workers=upload_workers, restart=restart,
+        )
+    except ValueError as e:
+        raise click.ClickException(str(e))
+    print(f"[backfill] Done: {issued} issued, {reissued} re-issued, {failed} failed")
+    if failed and not regenerate:
+        print("[backfill] Run again to retry the failed uploads")
+
+
+def _job_json(job):
+    return {
+        "job_id": job.id,
+        "status": job.status,
+        "attempts": job.attempts,
+        "certificate_url": job.certificate_url if job.status == 'done' else None,
+        "error": job.error if job.status == 'failed' else None,
+    }
 
-STORAGE_ZONE = "thumbnailspilearn"
-ACCESS_KEY = "0ba2a024-c7dc-423d-a4f9cb83c4cf-f9ff-41cf"
-CDN_BASE_URL = "https://learnpi.b-cdn.net"
 
 @bp.route("/generate", methods=["POST"])
 def generate_certificate():
-    from models import Certificate, Course, Progress, User, Lecture
+    """Queue issuance of a completion certificate and return the job to poll.
+
+    Answers 200 with ``certificate_url`` if the certificate already exists,
+    otherwise 202 with a ``job_id`` for ``/status/<job_id>``; rendering and
+    the upload to Bunny storage happen on the certificate queue.
+    """
+    from models import Certificate
     data = request.get_json()
     access_token = data.get("accessToken")
     course_id = data.get("course_id")
 
     if not access_token or not course_id:
         return jsonify({"success": False, "error": "Missing fields"}), 400
+    try:
+        course_id = int(course_id)
+    except (TypeError, ValueError):
+        return jsonify({"success": False, "error": "Invalid course_id"}), 400
 
     user_data = verify_pi_token(access_token)
     if not user_data:
         return jsonify({"success": False, "error": "Invalid Pi token"}), 401
 
-    user = User.query.filter_by(pi_uid=user_data["uid"]).first()
-    if not user:
+    identity = resolve_identity(user_data)
+    if not identity:
         return jsonify({"success": False, "error": "User not found"}), 404
 
-    progress = Progress.query.filter_by(user_id=user.id, course_id=course_id, completed=True).count()
-    total_lectures = Lecture.query.filter_by(course_id=course_id).count()
-
-    print(progress)
-    print(total_lectures)
-    if progress < total_lectures or total_lectures == 0:
+    if not is_eligible(identity.user_id, course_id):
         return jsonify({"success": False, "error": "Course not fully completed"}), 403
 
-    existing = Certificate.query.filter_by(user_id=user.id, course_id=course_id).first()
+    existing = Certificate.query.filter_by(user_id=identity.user_id, course_id=course_id).first()
     if existing:
         return jsonify({"success": True, "certificate_url": existing.pdf_url})
 
-    # Generate certificate PDF locally
-    course = Course.query.get(course_id)
-    file_name = f"certificate_{user.id}_{course.id}.pdf"
-    local_path = os.path.join("temp_certificates", file_name)
-    os.makedirs("temp_certificates", exist_ok=True)
-
-    c = canvas.Canvas(local_path, pagesize=A4)
-    c.setFont("Helvetica-Bold", 24)
-    c.drawCentredString(300, 700, "Certificate of Completion")
-    c.setFont("Helvetica", 16)
-    c.drawCentredString(300, 650, f"This is to certify that")
-    c.setFont("Helvetica-Bold", 18)
-    c.drawCentredString(300, 610, user.username)
-    c.setFont("Helvetica", 16)
-    c.drawCentredString(300, 570, f"has successfully completed the course:")
-    c.setFont("Helvetica-Bold", 18)
-    c.drawCentredString(300, 530, course.title)
-    c.setFont("Helvetica", 12)
-    c.drawCentredString(300, 480, f"Issued on {datetime.utcnow().strftime('%Y-%m-%d')}")
-    c.save()
-
-    # Upload to Bunny.net
-    bunny_url = f"https://storage.bunnycdn.com/{STORAGE_ZONE}/certificates/{file_name}"
-    headers = {"AccessKey": ACCESS_KEY, "Content-Type": "application/octet-stream"}
-
-    with open(local_path, "rb") as f:
-        response = requests.put(bunny_url, headers=headers, data=f)
-    
-    # Remove local file
-    os.remove(local_path)
-
-    if response.status_code not in (200, 201):
-        return jsonify({"success": False, "error": "Failed to upload to Bunny.net"}), 500
-
-    cert_url = f"{CDN_BASE_URL}/certificates/{file_name}"
-
-    cert = Certificate(user_id=user.id, course_id=course.id, pdf_url=cert_url)
-    db.session.add(cert)
-    db.session.commit()
-
-    return jsonify({"success": True, "certificate_url": cert_url})
+    job = enqueue_certificate(identity.user_id, course_id)
+    return jsonify({"success": True, **_job_json(job)}), 202
+
+
+@bp.route("/status/<int:job_id>", methods=["GET"])
+def certificate_status(job_id):
+    """Progress of a certificate job: ``queued``, ``rendering``, ``uploading``, ``done`` or ``failed``.
+
+    Authenticated with ``Authorization: Bearer <Pi access token>``; only the
+    job's owner can see it.
+    """
+    from models import CertificateJob
+    auth_header = request.headers.get('Authorization')
+    if not auth_header or not auth_header.startswith('Bearer '):
+        return jsonify({"success": False, "error": "Unauthorized"}), 401
+
+    user_data = verify_pi_token(auth_header.split('Bearer ')[1])
+    if not user_data:
+        return jsonify({"success": False, "error": "Invalid Pi token"}), 401
+
+    identity = resolve_identity(user_data)
+    if not identity:
+        return jsonify({"success": False, "error": "User not found"}), 404
+
+    job = db.session.get(CertificateJob, job_id)
+    if job is None or job.user_id != identity.user_id:
+        return jsonify({"success": False, "error": "Job not found"}), 404
+    return jsonify({"success": True, **_job_json(job)})
 
 @bp.route("/my", methods=["POST"])
 def my_certificates():
-    from models import Certificate, Course,  User
+    """Issued certificates, plus ``claimable``: completed courses with no certificate yet."""
+    from models import Certificate, Course
     data = request.get_json()
     access_token = data.get("accessToken")
 
@@ -108,19 +130,63 @@ def my_certificates():
     if not user_data:
         return jsonify({"success": False, "error": "Invalid Pi token"}), 401
 
-    user = User.query.filter_by(pi_uid=user_data["uid"]).first()
-    if not user:
+    identity = resolve_identity(user_data)
+    if not identity:
         return jsonify({"success": False, "error": "User not found"}), 404
 
-    certs = Certificate.query.filter_by(user_id=user.id).all()
+    certs = (
+        db.session.query(Certificate.course_id, Certificate.pdf_url, Certificate.issued_at, Course.title)
+        .join(Course, Course.id == Certificate.course_id)
+        .filter(Certificate.user_id == identity.user_id)
+        .all()
+    )
+    issued = {c.course_id for c in certs}
+    completed = completed_courses([identity.user_id])[identity.user_id]
     return jsonify({
         "success": True,
         "certificates": [
             {
                 "course_id": c.course_id,
-                "course_title": Course.query.get(c.course_id).title,
+                "course_title": c.title,
                 "pdf_url": c.pdf_url,
                 "issued_at": c.issued_at.isoformat()
             } for c in certs
+        ],
+        "claimable": sorted(completed - issued)
+    })
+
+
+@bp.route("/eligible", methods=["POST"])
+def eligible_certificates():
+    """Every course the user has completed, with its certificate URL once issued, in one query."""
+    from models import Certificate, Course
+    data = request.get_json()
+    access_token = data.get("accessToken")
+
+    user_data = verify_pi_token(access_token)
+    if not user_data:
+        return jsonify({"success": False, "error": "Invalid Pi token"}), 401
+
+    identity = resolve_identity(user_data)
+    if not identity:
+        return jsonify({"success": False, "error": "User not found"}), 404
+
+    completed = completed_courses_query([identity.user_id]).subquery()
+    rows = (
+        db.session.query(Course.id, Course.title, Certificate.pdf_url)
+        .join(completed, completed.c.course_id == Course.id)
+        .outerjoin(Certificate, and_(Certificate.user_id == identity.user_id, Certificate.course_id == Course.id))
+        .order_by(Course.id)
+        .all()
+    )
+    return jsonify({
+        "success": True,
+        "courses": [
+            {
+                "course_id": course_id,
+                "course_title": title,
+                "certificate_url": pdf_url,
+                "claimable": pdf_url is None
+            } for course_id, title, pdf_url in rows
         ]
     })
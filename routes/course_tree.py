@@ -0,0 +1,135 @@
+import json
+from datetime import datetime
+
+from flask import abort
+
+from extensions import db
+
+
+def load_course_tree(course_id):
+    """Return ``(course, [(section, [lectures])])`` for a course in two queries, or 404.
+
+    Sections and lectures come from a single outer join ordered by
+    ``(Section.order, Lecture.order)`` instead of one lazy load per section.
+    """
+    from models import Course
+    course = db.session.get(Course, course_id)
+    if course is None:
+        abort(404)
+    return course, load_course_trees([course_id]).get(course_id, [])
+
+
+def load_course_trees(course_ids, reload=False):
+    """Return ``{course_id: [(section, [lectures])]}`` for many courses in one query.
+
+    Courses without sections are absent from the result. With ``reload``
+    sections and lectures already in the session are overwritten with the
+    stored rows, so values come back with their column types.
+    """
+    from models import Section, Lecture
+    query = (
+        db.session.query(Section, Lecture)
+        .outerjoin(Lecture, Lecture.section_id == Section.id)
+        .filter(Section.course_id.in_(course_ids))
+        .order_by(Section.course_id, Section.order.asc(), Section.id.asc(), Lecture.order.asc(), Lecture.id.asc())
+    )
+    if reload:
+        query = query.populate_existing()
+    rows = query.all()
+
+    trees = {}
+    for section, lecture in rows:
+        tree = trees.setdefault(section.course_id, [])
+        if not tree or tree[-1][0] is not section:
+            tree.append((section, []))
+        if lecture is not None:
+            tree[-1][1].append(lecture)
+    return trees
+
+
+def serialize_outline(tree):
+    """Turn a loaded course tree into the column values of a CourseOutline row."""
+    sections, lectures, total = [], [], 0
+    for section, section_lectures in tree:
+        items = [{
+            "id": l.id,
+            "title": l.title,
+            "order": l.order,
+            "video_id": l.video_id,
+            "duration": l.duration,
+            "section_id": l.section_id
+        } for l in section_lectures]
+        sections.append({
+            "id": section.id,
+            "title": section.title,
+            "order": section.order,
+            "lectures": items
+        })
+        lectures.extend(items)
+        total += sum(l.duration or 0 for l in section_lectures)
+
+    return {
+        "sections_json": json.dumps(sections),
+        "lectures_json": json.dumps(lectures),
+        "section_count": len(sections),
+        "lecture_count": len(lectures),
+        "total_duration": total,
+    }
+
+
+def refresh_outline(course_id):
+    """Rebuild a course's stored outline; call before committing a curriculum change.
+
+    Pending changes are flushed and read back first, so a value assigned
+    from a request (say ``order="5"``) is stored as the column's type.
+    """
+    from models import Course, CourseOutline
+    db.session.flush()
+    if db.session.get(Course, course_id) is None:
+        abort(404)
+    tree = load_course_trees([course_id], reload=True).get(course_id, [])
+    outline = db.session.get(CourseOutline, course_id)
+    if outline is None:
+        outline = CourseOutline(course_id=course_id)
+        db.session.add(outline)
+    for name, value in serialize_outline(tree).items():
+        setattr(outline, name, value)
+    outline.updated_at = datetime.utcnow()
+    return outline
+
+
+def get_outline(course_id):
+    """Return the stored outline of a course, or 404.
+
+    Outlines are written by curriculum changes and the migration backfill;
+    a course that has none yet gets one built for this request only.
+    """
+    from models import CourseOutline
+    outline = db.session.get(CourseOutline, course_id)
+    if outline is None:
+        _, tree = load_course_tree(course_id)
+        outline = CourseOutline(course_id=course_id, **serialize_outline(tree))
+    return outline
+
+
+def get_outlines(course_ids):
+    """Return ``{course_id: outline}`` for courses known to exist, in at most two queries.
+
+    Like ``get_outline``, missing outlines are built in memory without being stored.
+    """
+    from models import CourseOutline
+    outlines = {o.course_id: o for o in CourseOutline.query.filter(CourseOutline.course_id.in_(course_ids))}
+    missing = [course_id for course_id in course_ids if course_id not in outlines]
+    if missing:
+        trees = load_course_trees(missing)
+        for course_id in missing:
+            outlines[course_id] = CourseOutline(course_id=course_id, **serialize_outline(trees.get(course_id, [])))
+    return outlines
+
+
+def outline_fields(outline):
+    """JSON members shared by every curriculum response, as a pre-encoded fragment."""
+    return (
+        f'"sections":{outline.sections_json},"section_count":{outline.section_count},'
+        f'"lecture_count":{outline.lecture_count},"total_duration":{outline.total_duration}'
+    )
@@ -1,97 +1,282 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, abort, current_app, request, jsonify
 from extensions import db
 
-from sqlalchemy import or_
+import json
+from datetime import datetime
+
+from sqlalchemy import and_, func, or_
 
 from .utils import verify_pi_token
+from .identity import resolve_identity
+from .search import search_courses
+from .response_cache import cached_response, course_scope, response_cache
+from .course_tree import get_outline, get_outlines, outline_fields
+from .entitlements import has_access
+from .pagination import decode_cursor, encode_cursor
+from .rankings import rollup_scores
 
 bp = Blueprint('courses', __name__)
 
+CATALOG_PAGE_SIZE = 24
+CATALOG_MAX_PAGE_SIZE = 100
+EXCERPT_LENGTH = 160
+MAX_BATCH_IDS = 100
+# sort -> Course column the catalog seeks on; ranked sorts are kept up to date by routes/rankings.py
+CATALOG_SORTS = {'newest': 'created_at', 'top_rated': 'rating_score', 'trending': 'trending_score'}
+BATCH_VIEWS = {
+    'card': ('title', 'excerpt', 'price_pi', 'instructor_id', 'instructor_name', 'thumbnail'),
+    'detail': ('title', 'description', 'price_pi', 'is_published', 'instructor_id', 'instructor_name',
+               'library_id', 'thumbnail', 'sections'),
+}
+
+
+@bp.cli.command('rollup-scores')
+def rollup_scores_command():
+    """Recompute top-rated and trending scores; run periodically, e.g. nightly from cron."""
+    ranked = rollup_scores()
+    response_cache().bump("catalog")
+    print(f"[rankings] Rolled up scores, {ranked} courses with purchases")
+
+
+def _parse_ids(raw):
+    """Parse ``"3,1,3"`` into ``[3, 1]``; raises ValueError on non-integers."""
+    return list(dict.fromkeys(int(i) for i in (raw or '').split(',') if i.strip()))
+
+
 @bp.route('/', methods=['GET'])
+@cached_response(lambda: "catalog")
 def list_courses():
-    from models import Course
+    """Published courses as lightweight cards, one keyset page at a time.
+
+    Query params: ``q`` (full-text search), ``sort`` (``newest``, the default,
+    ``top_rated`` or ``trending``; ignored by searches, which rank by
+    relevance), ``limit``, ``cursor`` (the ``next_cursor`` of the previous
+    page) and ``fields=description`` to include the full description in
+    addition to the excerpt.
+    """
+    from models import Course, User
     q = request.args.get('q')
-    query = Course.query.filter_by(is_published=True)
-    if q:
-        query = query.filter(or_(Course.title.ilike(f'%{q}%'), Course.description.ilike(f'%{q}%')))
-    courses = query.order_by(Course.created_at.desc()).all()
-    print('queried')
-    print(courses)
+    limit = min(max(request.args.get('limit', CATALOG_PAGE_SIZE, type=int), 1), CATALOG_MAX_PAGE_SIZE)
+    fields = set(request.args.get('fields', '').split(','))
+    sort = request.args.get('sort', 'newest')
+    if sort not in CATALOG_SORTS:
+        return jsonify({"success": False, "error": "Unknown sort"}), 400
+    sort_column = getattr(Course, CATALOG_SORTS[sort])
+    cursor = decode_cursor(request.args.get('cursor'))
+    if cursor is None:
+        return jsonify({"success": False, "error": "Invalid cursor"}), 400
+
+    columns = [
+        Course.id, Course.title, Course.price_pi, Course.instructor_id, Course.thumbnail_url, Course.created_at,
+        func.substr(Course.description, 1, EXCERPT_LENGTH).label('excerpt'),
+        User.username.label('instructor_name'),
+    ]
+    if 'description' in fields:
+        columns.append(Course.description)
+    if sort != 'newest':
+        columns.append(sort_column.label('score'))
+
+    query = Course.query.filter_by(is_published=True).outerjoin(User, User.id == Course.instructor_id)
+    try:
+        if q:
+            # Relevance order has no stable key to seek on, so search pages by offset
+            offset = int(cursor.get('o', 0))
+            query = search_courses(query, q).offset(offset)
+        else:
+            query = query.order_by(sort_column.desc(), Course.id.desc())
+            if cursor:
+                after = datetime.fromisoformat(cursor['t']) if sort == 'newest' else float(cursor['s'])
+                query = query.filter(or_(
+                    sort_column < after,
+                    and_(sort_column == after, Course.id < int(cursor['i']))
+                ))
+    except (KeyError, TypeError, ValueError):
+        return jsonify({"success": False, "error": "Invalid cursor"}), 400
+
+    rows = query.with_entities(*columns).limit(limit + 1).all()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        if q:
+            next_cursor = encode_cursor({'o': offset + limit})
+        elif sort == 'newest':
+            next_cursor = encode_cursor({'t': last.created_at.isoformat(), 'i': last.id})
+        else:
+            next_cursor = encode_cursor({'s': last.score, 'i': last.id})
+
     data = []
-    for c in courses:
-        data.append({
-            'id': c.id, 
-            'title': c.title, 
-            'description': c.description, 
-            'price_pi': c.price_pi, 
-            'instructor_id': c.instructor_id, 
+    for c in rows:
+        card = {
+            'id': c.id,
+            'title': c.title,
+            'excerpt': c.excerpt,
+            'price_pi': c.price_pi,
+            'instructor_id': c.instructor_id,
+            'instructor_name': c.instructor_name or 'Instructor',
             'thumbnail': c.thumbnail_url
-        })
-    return jsonify(data)
+        }
+        if 'description' in fields:
+            card['description'] = c.description
+        data.append(card)
+    return jsonify({"courses": data, "next_cursor": next_cursor})
 
 @bp.route('/<int:course_id>', methods=['GET'])
+@cached_response(course_scope)
 def course_detail(course_id):
-    from models import Course
-    course = Course.query.get_or_404(course_id)
-    
-    # Build sections with lectures
-    sections_data = []
-    for section in course.sections:
-        lectures_data = [{
-            'id': l.id, 
-            'title': l.title, 
-            'order': l.order, 
-            'video_id': l.video_id, 
-            'duration': l.duration
-        } for l in section.lectures]
-        
-        sections_data.append({
-            'id': section.id,
-            'title': section.title,
-            'order': section.order,
-            'lectures': lectures_data
-        })
-    
-    return jsonify({
-        'id': course.id, 
-        'title': course.title, 
-        'description': course.description, 
-        'price_pi': course.price_pi, 
-        'sections': sections_data,
-        'is_published': course.is_published,
-        'instructor_id': course.instructor_id, 
-        'library_id': course.library_id,
-        'thumbnail': course.thumbnail_url
+    from models import Course, CourseOutline
+    row = (
+        db.session.query(
+            Course.id, Course.title, Course.description, Course.price_pi, Course.is_published,
+            Course.instructor_id, Course.library_id, Course.thumbnail_url, CourseOutline
+        )
+        .outerjoin(CourseOutline, CourseOutline.course_id == Course.id)
+        .filter(Course.id == course_id)
+        .first()
+    )
+    if row is None:
+        abort(404)
+    outline = row.CourseOutline or get_outline(course_id)
+
+    head = json.dumps({
+        'id': row.id, 
+        'title': row.title, 
+        'description': row.description, 
+        'price_pi': row.price_pi, 
+        'is_published': row.is_published,
+        'instructor_id': row.instructor_id, 
+        'library_id': row.library_id,
+        'thumbnail': row.thumbnail_url
     })
+    return _json_body(head[:-1] + "," + outline_fields(outline) + "}")
+
+
+@bp.route('/batch', methods=['GET'])
+def course_batch():
+    """Several courses in one round-trip: ``?ids=1,2,3&view=card|detail&fields=title,thumbnail``.
+
+    ``view`` picks the default projection (``card`` matches catalog cards,
+    ``detail`` matches ``/api/courses/<id>``); ``fields`` narrows it to the
+    listed members so only those columns are read. Courses come back in the
+    order requested and unknown ids are listed under ``missing``. The
+    ``sections`` field is served from the stored outlines in one extra query.
+    """
+    from models import Course, User
+    view = request.args.get('view', 'card')
+    if view not in BATCH_VIEWS:
+        return jsonify({"success": False, "error": "view must be card or detail"}), 400
+    try:
+        ids = _parse_ids(request.args.get('ids'))
+    except ValueError:
+        return jsonify({"success": False, "error": "ids must be a comma-separated list of integers"}), 400
+    if len(ids) > MAX_BATCH_IDS:
+        return jsonify({"success": False, "error": f"At most {MAX_BATCH_IDS} ids per request"}), 400
+
+    fields = BATCH_VIEWS[view]
+    if request.args.get('fields'):
+        requested = [f for f in request.args['fields'].split(',') if f]
+        unknown = set(requested) - set(fields)
+        if unknown:
+            return jsonify({"success": False, "error": f"Unknown fields for {view} view: {', '.join(sorted(unknown))}"}), 400
+        fields = [f for f in fields if f in requested]
+    if not ids:
+        return jsonify({"success": True, "courses": [], "missing": []})
+
+    columns = {
+        'title': Course.title,
+        'excerpt': func.substr(Course.description, 1, EXCERPT_LENGTH).label('excerpt'),
+        'description': Course.description,
+        'price_pi': Course.price_pi,
+        'is_published': Course.is_published,
+        'instructor_id': Course.instructor_id,
+        'instructor_name': User.username.label('instructor_name'),
+        'library_id': Course.library_id,
+        'thumbnail': Course.thumbnail_url.label('thumbnail'),
+    }
+    scalar_fields = [f for f in fields if f in columns]
+    query = db.session.query(Course.id, *(columns[f] for f in scalar_fields)).filter(Course.id.in_(ids))
+    if 'instructor_name' in fields:
+        query = query.outerjoin(User, User.id == Course.instructor_id)
+    rows = {row.id: row for row in query}
+
+    outlines = get_outlines(list(rows)) if 'sections' in fields and rows else {}
+
+    courses = []
+    for course_id in ids:
+        row = rows.get(course_id)
+        if row is None:
+            continue
+        item = {'id': row.id}
+        for f in scalar_fields:
+            item[f] = getattr(row, f)
+        if 'instructor_name' in item:
+            item['instructor_name'] = item['instructor_name'] or 'Instructor'
+        encoded = json.dumps(item)
+        if course_id in outlines:
+            encoded = encoded[:-1] + "," + outline_fields(outlines[course_id]) + "}"
+        courses.append(encoded)
+
+    missing = [course_id for course_id in ids if course_id not in rows]
+    return _json_body('{"success":true,"courses":[' + ",".join(courses) + '],"missing":' + json.dumps(missing) + '}')
+
+
+def _json_body(body):
+    # Curriculum responses are spliced from the pre-serialized outline, not re-encoded
+    return current_app.response_class(body, mimetype="application/json")
 
 
 @bp.route('/<int:course_id>/access', methods=['GET'])
 def check_course_access(course_id):
-    from models import Course, Purchase
-    auth_header = request.headers.get('Authorization')
+    from models import Course
+    user_id, error = _bearer_user_id()
+    if error:
+        return error
 
-    if not auth_header or not auth_header.startswith('Bearer '):
-        return jsonify({"error": "Unauthorized"}), 401
+    # Entitled users never need the course row
+    if has_access(user_id, [course_id])[course_id]:
+        return jsonify({'has_access': True})
+
+    if not db.session.query(Course.id).filter_by(id=course_id).first():
+        return jsonify({'error': 'Course not found'}), 404
+    return jsonify({'has_access': False})
+
+
+@bp.route('/access', methods=['GET'])
+def check_courses_access():
+    """Bulk variant of ``/<id>/access``: ``?ids=1,2,3`` -> ``{"access": {"1": true, ...}}``.
 
+    Unknown course ids are reported as not accessible.
+    """
+    user_id, error = _bearer_user_id()
+    if error:
+        return error
     try:
-        user_id = int(auth_header.split('Bearer ')[1])
+        ids = _parse_ids(request.args.get('ids'))
     except ValueError:
-        return jsonify({"error": "Invalid user ID"}), 400
-    
-    # 2. Verify course exists
-    course = Course.query.get(course_id)
-    if not course:
-        return jsonify({'error': 'Course not found'}), 404
+        return jsonify({"success": False, "error": "ids must be a comma-separated list of integers"}), 400
+    if len(ids) > MAX_BATCH_IDS:
+        return jsonify({"success": False, "error": f"At most {MAX_BATCH_IDS} ids per request"}), 400
+
+    access = has_access(user_id, ids) if ids else {}
+    return jsonify({"success": True, "access": {str(course_id): granted for course_id, granted in access.items()}})
+
 
-    # 3. Check if user purchased it
-    purchase = Purchase.query.filter_by(
-        user_id=user_id,
-        course_id=course_id,
-        status='completed'
-    ).first()
+def _bearer_user_id():
+    """Resolve the ``Authorization: Bearer <token>`` header (session or Pi token) to a user id."""
+    auth_header = request.headers.get('Authorization')
+
+    if not auth_header or not auth_header.startswith('Bearer '):
+        return None, (jsonify({"error": "Unauthorized"}), 401)
+
+    user_data = verify_pi_token(auth_header.split('Bearer ')[1])
+    if not user_data:
+        return None, (jsonify({"error": "Invalid token"}), 401)
 
-    # 4. Return access result
-    return jsonify({'has_access': purchase is not None})
+    identity = resolve_identity(user_data)
+    if not identity:
+        return None, (jsonify({"error": "User not found"}), 404)
+    return identity.user_id, None
 
 
 @bp.route("/enrolled", methods=["POST"])
@@ -108,25 +293,31 @@ def get_enrolled_courses():
     if not user_data:
         return jsonify({"success": False, "error": "Invalid token"}), 401
 
-    user = User.query.filter_by(pi_uid=user_data["uid"]).first()
+    identity = resolve_identity(user_data)
     
-    if not user:
+    if not identity:
         return jsonify({"success": False, "error": "User not found"}), 404
 
-    purchases = Purchase.query.filter_by(user_id=user.id).all()
-    course_ids = [p.course_id for p in purchases]
-    courses = Course.query.filter(Course.id.in_(course_ids)).all()
+    purchased = db.session.query(Purchase.course_id).filter(Purchase.user_id == identity.user_id)
+    rows = (
+        db.session.query(
+            Course.id, Course.title, Course.description, Course.thumbnail_url, Course.instructor_id,
+            User.username.label('instructor_name')
+        )
+        .outerjoin(User, User.id == Course.instructor_id)
+        .filter(Course.id.in_(purchased))
+        .all()
+    )
     
     result = []
-    for c in courses:
-        instructor = User.query.get(c.instructor_id)
+    for c in rows:
         result.append({
             "id": c.id,
             "title": c.title,
             "description": c.description,
             "thumbnail": c.thumbnail_url,
             "instructor_id": c.instructor_id,
-            "instructor_name": instructor.username if instructor else "Instructor"
+            "instructor_name": c.instructor_name or "Instructor"
         })
     
     return jsonify({
@@ -144,82 +335,55 @@ def get_instructor(instructor_id):
     })
 
 
+@bp.route("/instructors", methods=["GET"])
+def get_instructors():
+    """Resolve many instructors at once: ``?ids=1,2,3`` (at most MAX_BATCH_IDS).
+
+    Returns ``{"success": True, "instructors": {id: {...}}}`` with each user's
+    username and number of published courses; unknown ids are left out.
+    """
+    from models import Course, User
+    try:
+        ids = _parse_ids(request.args.get('ids'))
+    except ValueError:
+        return jsonify({"success": False, "error": "ids must be a comma-separated list of integers"}), 400
+    if len(ids) > MAX_BATCH_IDS:
+        return jsonify({"success": False, "error": f"At most {MAX_BATCH_IDS} ids per request"}), 400
+    if not ids:
+        return jsonify({"success": True, "instructors": {}})
+
+    rows = (
+        db.session.query(User.id, User.username, func.count(Course.id).label('course_count'))
+        .outerjoin(Course, and_(Course.instructor_id == User.id, Course.is_published == True))
+        .filter(User.id.in_(ids))
+        .group_by(User.id, User.username)
+        .all()
+    )
+    return jsonify({
+        "success": True,
+        "instructors": {
+            str(r.id): {"id": r.id, "username": r.username, "course_count": r.course_count}
+            for r in rows
+        }
+    })
+
+
 @bp.route("/lectures/<int:course_id>", methods=["GET"])
+@cached_response(course_scope)
 def get_course_lectures(course_id):
-    from models import Course, Lecture, Section
     """Return all lectures for a given course_id, grouped by sections"""
-    course = Course.query.get_or_404(course_id)
+    outline = get_outline(course_id)
     
-    # Get all sections for this course
-    sections = Section.query.filter_by(course_id=course_id).order_by(Section.order.asc()).all()
-    
-    if not sections:
+    if not outline.section_count:
         return jsonify({"success": False, "message": "No sections found for this course"}), 204
     
-    # Build response with sections and their lectures
-    sections_data = []
-    all_lectures = []
-    
-    for section in sections:
-        lectures = Lecture.query.filter_by(section_id=section.id).order_by(Lecture.order.asc()).all()
-        
-        lectures_data = [{
-            "id": l.id,
-            "title": l.title,
-            "video_id": l.video_id,
-            "duration": l.duration,
-            "order": l.order,
-            "section_id": l.section_id
-        } for l in lectures]
-        
-        sections_data.append({
-            "id": section.id,
-            "title": section.title,
-            "order": section.order,
-            "lectures": lectures_data
-        })
-        
-        # Also add to flat list for backward compatibility
-        all_lectures.extend(lectures_data)
-    
-    return jsonify({
-        "success": True,
-        "sections": sections_data,
-        "lectures": all_lectures  # Flat list for backward compatibility
-    }), 200
+    # "lectures" is the flat list kept for backward compatibility
+    return _json_body('{"success":true,' + outline_fields(outline) + ',"lectures":' + outline.lectures_json + '}')
 
 
 @bp.route("/sections/<int:course_id>", methods=["GET"])
+@cached_response(course_scope)
 def get_course_sections(course_id):
-    from models import Course, Lecture, Section
     """Return all sections with their lectures for a given course"""
-    course = Course.query.get_or_404(course_id)
-    
-    sections = Section.query.filter_by(course_id=course_id).order_by(Section.order.asc()).all()
-    
-    if not sections:
-        return jsonify({"success": True, "sections": []}), 200
-    
-    sections_data = []
-    for section in sections:
-        lectures = Lecture.query.filter_by(section_id=section.id).order_by(Lecture.order.asc()).all()
-        
-        lectures_data = [{
-            "id": l.id,
-            "title": l.title,
-            "video_id": l.video_id,
-            "duration": l.duration,
-            "order": l.order
-        } for l in lectures]
-        
-        sections_data.append({
-            "id": section.id,
-            "title": section.title,
-            "order": section.order,
-            "lectures": lectures_data
-        })
-    
-    return jsonify({
-        "success": True,
-        "sections": sections_data
-    }), 200
\ No newline at end of file
+    outline = get_outline(course_id)
+    return _json_body('{"success":true,' + outline_fields(outline) + '}')
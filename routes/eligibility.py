@@ -0,0 +1,48 @@
+from sqlalchemy import func, select
+from sqlalchemy.orm import aliased
+
+from extensions import db
+
+
+def completed_courses_query(user_ids=None, course_ids=None):
+    """Select ``(user_id, course_id)`` for every course a user has fully completed.
+
+    One grouped query: completed Progress rows are joined to their course
+    through Lecture -> Section, grouped per (user, course), and kept when the
+    count reaches the course's lecture total, itself a correlated count over
+    the same join. Courses without lectures never qualify. ``user_ids`` and
+    ``course_ids`` narrow the scan; the result can be run directly or used
+    as a subquery.
+    """
+    from models import Lecture, Progress, Section
+    course_lecture, course_section = aliased(Lecture), aliased(Section)
+    total = (
+        select(func.count(course_lecture.id))
+        .join(course_section, course_section.id == course_lecture.section_id)
+        .where(course_section.course_id == Section.course_id)
+        .scalar_subquery()
+    )
+    query = (
+        select(Progress.user_id, Section.course_id)
+        .join(Lecture, Lecture.id == Progress.lecture_id)
+        .join(Section, Section.id == Lecture.section_id)
+        .where(Progress.completed.is_(True))
+    )
+    if user_ids is not None:
+        query = query.where(Progress.user_id.in_(user_ids))
+    if course_ids is not None:
+        query = query.where(Section.course_id.in_(course_ids))
+    return query.group_by(Progress.user_id, Section.course_id).having(func.count(Progress.lecture_id) == total)
+
+
+def completed_courses(user_ids, course_ids=None):
+    """Return ``{user_id: set(course_ids)}`` of fully completed courses for many users at once."""
+    result = {user_id: set() for user_id in user_ids}
+    for user_id, course_id in db.session.execute(completed_courses_query(user_ids, course_ids)):
+        result[user_id].add(course_id)
+    return result
+
+
+def is_eligible(user_id, course_id):
+    """Whether a user has completed every lecture of a course and may claim its certificate."""
+    return course_id in completed_courses([user_id], [course_id])[user_id]
@@ -0,0 +1,63 @@
+from datetime import datetime
+
+from flask import current_app
+
+from extensions import db
+from .cache import TTLCache
+from .sql import upsert_insert
+
+# user_id -> frozenset of course ids, shared by every request in this worker
+_entitlements = TTLCache(maxsize=8192)
+
+
+def entitled_course_ids(user_id):
+    """Every course the user may access, loaded once and kept in the per-worker cache."""
+    from models import Entitlement
+    course_ids = _entitlements.get(user_id)
+    if course_ids is None:
+        rows = db.session.query(Entitlement.course_id).filter(Entitlement.user_id == user_id).all()
+        course_ids = frozenset(course_id for course_id, in rows)
+        _entitlements.set(user_id, course_ids, current_app.config.get("ENTITLEMENT_CACHE_TTL", 300))
+    return course_ids
+
+
+def has_access(user_id, course_ids):
+    """Return ``{course_id: bool}`` for many courses at once.
+
+    Hits come straight from the cached set. Misses are confirmed against the
+    unique (user_id, course_id) index in one query, so a purchase recorded by
+    another worker is honoured immediately instead of after the cache TTL.
+    """
+    from models import Entitlement
+    owned = entitled_course_ids(user_id)
+    result = {course_id: course_id in owned for course_id in course_ids}
+    unknown = [course_id for course_id, granted in result.items() if not granted]
+    if unknown:
+        found = db.session.query(Entitlement.course_id).filter(
+            Entitlement.user_id == user_id, Entitlement.course_id.in_(unknown)
+        ).all()
+        if found:
+            invalidate_entitlements(user_id)
+            for course_id, in found:
+                result[course_id] = True
+    return result
+
+
+def grant_entitlement(user_id, course_id, purchase_id=None, source="purchase"):
+    """Record that a user may access a course; a no-op if they already can.
+
+    Call inside the transaction that records the purchase and
+    ``invalidate_entitlements`` once it is committed.
+    """
+    from models import Entitlement
+    values = dict(user_id=user_id, course_id=course_id, purchase_id=purchase_id, source=source, granted_at=datetime.utcnow())
+    insert = upsert_insert(Entitlement)
+    if insert is not None:
+        db.session.execute(insert.values(**values).on_conflict_do_nothing(index_elements=["user_id", "course_id"]))
+    elif not Entitlement.query.filter_by(user_id=user_id, course_id=course_id).first():
+        db.session.add(Entitlement(**values))
+
+
+def invalidate_entitlements(user_id):
+    """Drop a user's cached entitlement set after a purchase."""
+    _entitlements.delete(user_id)
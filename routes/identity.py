@@ -0,0 +1,53 @@
+from collections import namedtuple
+
+from flask import current_app, g
+
+from extensions import db
+from .cache import TTLCache
+
+Identity = namedtuple("Identity", ["user_id", "username", "role", "instructor_id"])
+
+# pi_uid -> Identity, shared by every request in this worker
+_identities = TTLCache(maxsize=8192)
+
+
+def resolve_identity(user_data):
+    """Return the Identity for a verified token, or None if the user does not exist.
+
+    Loaded at most once per request into ``g.identity`` and served from the
+    in-process identity map afterwards, so handlers skip the User and
+    Instructor lookups. Non-instructors are cached for a shorter time so a
+    promotion handled by another worker becomes visible quickly.
+    """
+    from models import User, Instructor
+    uid = user_data["uid"]
+    identity = g.get("identity")
+    if identity is not None and g.identity_uid == uid:
+        return identity
+
+    identity = _identities.get(uid)
+    if identity is None:
+        row = (
+            db.session.query(User.id, User.username, User.role, Instructor.id)
+            .outerjoin(Instructor, Instructor.user_id == User.id)
+            .filter(User.pi_uid == uid)
+            .first()
+        )
+        if row is None:
+            return None
+        identity = Identity(*row)
+        config = current_app.config
+        ttl = config.get("IDENTITY_CACHE_TTL", 300) if identity.instructor_id else config.get("IDENTITY_CACHE_STUDENT_TTL", 30)
+        _identities.set(uid, identity, ttl)
+
+    g.identity = identity
+    g.identity_uid = uid
+    return identity
+
+
+def invalidate_identity(pi_uid):
+    """Drop a cached identity after its role or instructor status changes."""
+    _identities.delete(pi_uid)
+    if g.get("identity_uid") == pi_uid:
+        g.pop("identity", None)
+        g.pop("identity_uid", None)
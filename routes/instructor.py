@@ -3,6 +3,11 @@ from flask import Blueprint, request, jsonify
 from extensions import db   
 
 from .utils import verify_pi_token  # Add this import
+from .identity import resolve_identity
+from .search import index_course
+from .response_cache import invalidate_course
+from .course_tree import refresh_outline
+from .progress_summary import adjust_total_lectures
 
 from datetime import datetime
 import re
@@ -41,21 +46,21 @@ def become_instructor():
             return jsonify({"success": False, "error": "Invalid Pi token"}), 401
         print(type(user_data))
         # ✅ Find the user in database
-        user = User.query.filter_by(username=user_data["username"]).first()
+        identity = resolve_identity(user_data)
         
-        if not user:
+        if not identity:
             print("not user")
             return jsonify({"success": False, "error": "User not found"}), 404
 
         # ✅ Check if user already an instructor
-        existing_instructor = Instructor.query.filter_by(user_id=user.id).first()
-        if existing_instructor:
+        if identity.instructor_id:
+            existing_instructor = Instructor.query.get(identity.instructor_id)
             return jsonify({
                 "success": True,
                 "alreadyInstructor": True,
                 "message": "User is already an instructor",
                 "instructor": {
-                    "user_id": user.id,
+                    "user_id": identity.user_id,
                     "id": existing_instructor.id,
                     "total_earnings": existing_instructor.total_earnings
                 }
@@ -66,7 +71,7 @@ def become_instructor():
             "success": True,
             "alreadyInstructor": False,
             "message": "This is User account",
-            "user_id": user.id
+            "user_id": identity.user_id
         }), 201
 
     except Exception as e:
@@ -99,12 +104,11 @@ def add_course():
     if not user_data:
         return jsonify({"success": False, "error": "Invalid Pi token"}), 401
 
-    user = User.query.filter_by(pi_uid=user_data["uid"]).first()
-    if not user:
+    identity = resolve_identity(user_data)
+    if not identity:
         return jsonify({"success": False, "error": "User not found"}), 404
 
-    instructor = Instructor.query.filter_by(user_id=user.id).first()
-    if not instructor:
+    if not identity.instructor_id:
         return jsonify({"success": False, "error": "Not an instructor"}), 403
     lacle = str()
     # --- Create Bunny video library for this course ---
@@ -149,7 +153,7 @@ def add_course():
         slug=slugify(title),
         description=description,
         price_pi=price_pi,
-        instructor_id=user.id,
+        instructor_id=identity.user_id,
         thumbnail_url=thumbnail_url,
         is_published=False,
         created_at=datetime.utcnow(),
@@ -157,7 +161,11 @@ def add_course():
         apikey=lacle
     )
     db.session.add(course)
+    db.session.flush()
+    index_course(course)
+    refresh_outline(course.id)
     db.session.commit()
+    invalidate_course(course.id, catalog=True)
 
     return jsonify({
         "success": True,
@@ -182,9 +190,9 @@ def add_lecture():
     
     access_token = auth_header.split(' ')[1]  
 
-    section_id = request.form.get("section_id")
+    section_id = request.form.get("section_id", type=int)
     title = request.form.get("title")
-    order = request.form.get("order", 0)
+    order = request.form.get("order", 0, type=int)
     video_file = request.files.get("video")
 
     if not all([access_token, section_id, title, video_file]):
@@ -195,12 +203,11 @@ def add_lecture():
     if not user_data:
         return jsonify({"success": False, "error": "Invalid Pi token"}), 401
 
-    user = User.query.filter_by(pi_uid=user_data["uid"]).first()
-    if not user:
+    identity = resolve_identity(user_data)
+    if not identity:
         return jsonify({"success": False, "error": "User not found"}), 404
 
-    instructor = Instructor.query.filter_by(user_id=user.id).first()
-    if not instructor:
+    if not identity.instructor_id:
         return jsonify({"success": False, "error": "Not an instructor"}), 403
 
     # Validate section ownership
@@ -208,7 +215,7 @@ def add_lecture():
     if not section:
         return jsonify({"success": False, "error": "Section not found"}), 404
 
-    course = Course.query.filter_by(id=section.course_id, instructor_id=user.id).first()
+    course = Course.query.filter_by(id=section.course_id, instructor_id=identity.user_id).first()
     if not course:
         return jsonify({"success": False, "error": "Unauthorized for this section"}), 403
 
@@ -258,7 +265,10 @@ def add_lecture():
                 duration=duration
             )
             db.session.add(lecture)
+            adjust_total_lectures(course.id, 1)
+            refresh_outline(course.id)
             db.session.commit()
+            invalidate_course(course.id)
 
             return jsonify({
                 'success': True,
@@ -291,20 +301,20 @@ def instructor_dashboard():
     if not user_data:
         return jsonify({"success": False, "error": "Invalid token"}), 401
 
-    user = User.query.filter_by(pi_uid=user_data["uid"]).first()
-    if not user:
+    identity = resolve_identity(user_data)
+    if not identity:
         return jsonify({"success": False, "error": "User not found"}), 404
 
-    instructor = Instructor.query.filter_by(user_id=user.id).first()
-    if not instructor:
+    if not identity.instructor_id:
         return jsonify({"success": False, "error": "Not an instructor"}), 403
 
-    courses = Course.query.filter_by(instructor_id=user.id).all()
+    instructor = Instructor.query.get(identity.instructor_id)
+    courses = Course.query.filter_by(instructor_id=identity.user_id).all()
 
     return jsonify({
         "success": True,
         "instructor": {
-            "name": user.username,
+            "name": identity.username,
             "total_earnings": instructor.total_earnings
         },
         "courses": [
@@ -336,15 +346,14 @@ def edit_course(course_id):
     if not user_data:
         return jsonify({"success": False, "error": "Invalid Pi token"}), 401
 
-    user = User.query.filter_by(pi_uid=user_data["uid"]).first()
-    if not user:
+    identity = resolve_identity(user_data)
+    if not identity:
         return jsonify({"success": False, "error": "User not found"}), 404
 
-    instructor = Instructor.query.filter_by(user_id=user.id).first()
-    if not instructor:
+    if not identity.instructor_id:
         return jsonify({"success": False, "error": "Not an instructor"}), 403
 
-    course = Course.query.filter_by(id=course_id, instructor_id=user.id).first()
+    course = Course.query.filter_by(id=course_id, instructor_id=identity.user_id).first()
     if not course:
         return jsonify({"success": False, "error": "Course not found or unauthorized"}), 404
 
@@ -391,7 +400,9 @@ def edit_course(course_id):
             return jsonify({"success": False, "error": f"Thumbnail upload failed: {str(e)}"}), 500
 
     # ✅ Save changes
+    index_course(course)
     db.session.commit()
+    invalidate_course(course.id, catalog=True)
 
     return jsonify({
         "success": True,
@@ -421,24 +432,26 @@ def edit_lecture():
     if not user_data:
         return jsonify({"success": False, "error": "Invalid token"}), 401
 
-    user = User.query.filter_by(pi_uid=user_data["uid"]).first()
-    if not user:
+    identity = resolve_identity(user_data)
+    if not identity:
         return jsonify({"success": False, "error": "User not found"}), 404
 
-    instructor = Instructor.query.filter_by(user_id=user.id).first()
-    if not instructor:
+    if not identity.instructor_id:
         return jsonify({"success": False, "error": "Not an instructor"}), 403
 
     lecture = Lecture.query.get(lecture_id)
     if not lecture:
         return jsonify({"success": False, "error": "Lecture not found"}), 404
 
-    course = Course.query.filter_by(id=lecture.course_id, instructor_id=user.id).first()
+    course_id = lecture.section.course_id if lecture.section else None
+    course = Course.query.filter_by(id=course_id, instructor_id=identity.user_id).first()
     if not course:
         return jsonify({"success": False, "error": "Unauthorized"}), 403
 
     lecture.title = new_title
+    refresh_outline(course.id)
     db.session.commit()
+    invalidate_course(course.id)
 
     return jsonify({"success": True, "message": "Lecture title updated successfully"})
 
@@ -458,16 +471,16 @@ def update_lecture_order():
         return jsonify({"success": False, "error": "Invalid token"}), 401
 
     # Find user
-    user = User.query.filter_by(pi_uid=user_data["uid"]).first()
-    if not user:
+    identity = resolve_identity(user_data)
+    if not identity:
         return jsonify({"success": False, "error": "User not found"}), 404
 
     # Ensure instructor
-    instructor = Instructor.query.filter_by(user_id=user.id).first()
-    if not instructor:
+    if not identity.instructor_id:
         return jsonify({"success": False, "error": "Not an instructor"}), 403
 
     # Update lecture order
+    touched = set()
     for item in updates:
         lecture = Lecture.query.get(item.get("lecture_id"))
         if not lecture:
@@ -478,15 +491,20 @@ def update_lecture_order():
             continue
 
         course = Course.query.get(section.course_id)
-        if not course or course.instructor_id != user.id:
+        if not course or course.instructor_id != identity.user_id:
             continue  # ensure this instructor owns the course
 
         # Update order
         new_order = item.get("new_order")
         if new_order is not None:
             lecture.order = new_order
+            touched.add(course.id)
 
+    for course_id in touched:
+        refresh_outline(course_id)
     db.session.commit()
+    for course_id in touched:
+        invalidate_course(course_id)
     return jsonify({"success": True, "message": "Lecture order updated successfully"})
 
 @bp.route("/add_section", methods=["POST"])
@@ -505,17 +523,19 @@ def add_section():
     if not user_data:
         return jsonify({"success": False, "error": "Invalid Pi token"}), 401
 
-    user = User.query.filter_by(pi_uid=user_data["uid"]).first()
-    if not user:
+    identity = resolve_identity(user_data)
+    if not identity:
         return jsonify({"success": False, "error": "User not found"}), 404
 
-    course = Course.query.filter_by(id=course_id, instructor_id=user.id).first()
+    course = Course.query.filter_by(id=course_id, instructor_id=identity.user_id).first()
     if not course:
         return jsonify({"success": False, "error": "Course not found or unauthorized"}), 403
 
     section = Section(course_id=course.id, title=title, order=order)
     db.session.add(section)
+    refresh_outline(course.id)
     db.session.commit()
+    invalidate_course(course.id)
 
     return jsonify({
         "success": True,
@@ -546,8 +566,8 @@ def edit_section():
     if not user_data:
         return jsonify({"success": False, "error": "Invalid Pi token"}), 401
 
-    user = User.query.filter_by(pi_uid=user_data["uid"]).first()
-    if not user:
+    identity = resolve_identity(user_data)
+    if not identity:
         return jsonify({"success": False, "error": "User not found"}), 404
 
     section = Section.query.get(section_id)
@@ -555,7 +575,7 @@ def edit_section():
         return jsonify({"success": False, "error": "Section not found"}), 404
 
     course = Course.query.get(section.course_id)
-    if course.instructor_id != user.id:
+    if course.instructor_id != identity.user_id:
         return jsonify({"success": False, "error": "Unauthorized"}), 403
 
     if title:
@@ -563,7 +583,9 @@ def edit_section():
     if order is not None:
         section.order = order
 
+    refresh_outline(course.id)
     db.session.commit()
+    invalidate_course(course.id)
 
     return jsonify({
         "success": True,
@@ -589,22 +611,27 @@ def update_section_order():
     if not user_data:
         return jsonify({"success": False, "error": "Invalid token"}), 401
 
-    user = User.query.filter_by(pi_uid=user_data["uid"]).first()
-    if not user:
+    identity = resolve_identity(user_data)
+    if not identity:
         return jsonify({"success": False, "error": "User not found"}), 404
 
-    instructor = Instructor.query.filter_by(user_id=user.id).first()
-    if not instructor:
+    if not identity.instructor_id:
         return jsonify({"success": False, "error": "Not an instructor"}), 403
 
+    touched = set()
     for item in updates:
         section = Section.query.get(item.get("section_id"))
         if section:
-            course = Course.query.filter_by(id=section.course_id, instructor_id=user.id).first()
+            course = Course.query.filter_by(id=section.course_id, instructor_id=identity.user_id).first()
             if course:
                 section.order = item.get("new_order", section.order)
+                touched.add(course.id)
 
+    for course_id in touched:
+        refresh_outline(course_id)
     db.session.commit()
+    for course_id in touched:
+        invalidate_course(course_id)
 
     return jsonify({"success": True, "message": "Section order updated successfully"}), 200
 
@@ -654,16 +681,15 @@ def get_instructor_students():
     if not user_data:
         return jsonify({"success": False, "error": "Invalid Pi token"}), 401
 
-    user = User.query.filter_by(pi_uid=user_data["uid"]).first()
-    if not user:
+    identity = resolve_identity(user_data)
+    if not identity:
         return jsonify({"success": False, "error": "User not found"}), 404
 
-    instructor = Instructor.query.filter_by(user_id=user.id).first()
-    if not instructor:
+    if not identity.instructor_id:
         return jsonify({"success": False, "error": "Not an instructor"}), 403
 
     # --- Get instructor courses ---
-    courses = Course.query.filter_by(instructor_id=user.id).all()
+    courses = Course.query.filter_by(instructor_id=identity.user_id).all()
 
     total_students = 0
     course_data = []
@@ -0,0 +1,44 @@
+import threading
+from collections import deque
+
+
+class Metrics:
+    """In-process latency and counter registry, one per worker."""
+
+    SAMPLES = 1024  # recent samples kept per timer for percentiles
+
+    def __init__(self):
+        self._timers = {}
+        self._counters = {}
+        self._lock = threading.Lock()
+
+    def observe(self, name, seconds):
+        with self._lock:
+            timer = self._timers.get(name)
+            if timer is None:
+                timer = self._timers[name] = {"count": 0, "total": 0.0, "max": 0.0, "samples": deque(maxlen=self.SAMPLES)}
+            timer["count"] += 1
+            timer["total"] += seconds
+            timer["max"] = max(timer["max"], seconds)
+            timer["samples"].append(seconds)
+
+    def incr(self, name, amount=1):
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + amount
+
+    def snapshot(self):
+        with self._lock:
+            timers = {}
+            for name, timer in self._timers.items():
+                samples = sorted(timer["samples"])
+                timers[name] = {
+                    "count": timer["count"],
+                    "avg_ms": round(timer["total"] / timer["count"] * 1000, 3),
+                    "p50_ms": round(samples[len(samples) // 2] * 1000, 3),
+                    "p99_ms": round(samples[min(len(samples) - 1, int(len(samples) * 0.99))] * 1000, 3),
+                    "max_ms": round(timer["max"] * 1000, 3),
+                }
+            return {"timers": timers, "counters": dict(self._counters)}
+
+
+metrics = Metrics()
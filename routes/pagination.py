@@ -0,0 +1,19 @@
+import base64
+import json
+
+
+def encode_cursor(position):
+    """Pack a keyset position (a small dict) into an opaque URL-safe cursor."""
+    raw = json.dumps(position, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor):
+    """Decode an opaque next_cursor; returns {} for the first page and None if malformed."""
+    if not cursor:
+        return {}
+    try:
+        position = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        return position if isinstance(position, dict) else None
+    except ValueError:
+        return None
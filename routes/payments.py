@@ -1,14 +1,11 @@
 from flask import Blueprint, request, jsonify, session
 from extensions import db
 from datetime import datetime
-import os
-import requests
 
-apikey = os.getenv("apikey")
-
-HEADERS = {
-    'Authorization': f"Key {apikey}"
-}
+from .pi_client import pi_client
+from .identity import invalidate_identity
+from .entitlements import grant_entitlement, invalidate_entitlements
+from .rankings import record_purchase_score
 
 bp = Blueprint('purchases', __name__)
 
@@ -49,6 +46,8 @@ def confirm_purchase():
         confirmed_at=datetime.utcnow()
     )
 
+    # tx_id comes from the client and is not checked with Pi, so this row grants
+    # no access and counts toward no ranking; /complete unlocks verified payments
     db.session.add(new_purchase)
     db.session.commit()
 
@@ -58,7 +57,6 @@ def confirm_purchase():
 def approve_payment():
     
     try:
-        print(apikey)
         data = request.get_json()
         if not data:
             return jsonify(status="error", message="No JSON data provided"), 400
@@ -67,7 +65,7 @@ def approve_payment():
         if not payment_id:
             return jsonify(status="error", message="Missing paymentId"), 400
 
-        response = requests.post(f"https://api.minepi.com/v2/payments/{payment_id}/approve", headers=HEADERS)
+        response = pi_client().approve_payment(payment_id)
         if response.status_code == 200:
             return jsonify(status="ok", message="Payment approved"), 200
         else:
@@ -93,12 +91,7 @@ def complete_payment():
             return jsonify(status="error", message="Missing paymentId or txid"), 400
 
         # Complete the payment with Pi API
-        complete_data = {'txid': txid}
-        response = requests.post(
-            f"https://api.minepi.com/v2/payments/{payment_id}/complete",
-            headers={**HEADERS, 'Content-Type': 'application/json'},
-            json=complete_data
-        )
+        response = pi_client().complete_payment(payment_id, txid)
 
         if response.status_code != 200:
             print("third")
@@ -140,7 +133,11 @@ def complete_payment():
                 return jsonify({"error": "Instructor not found"}), 404
 
             db.session.add(new_purchase)
+            db.session.flush()
+            grant_entitlement(int(user_id), int(course_id), purchase_id=new_purchase.id)
+            record_purchase_score(int(course_id), new_purchase.created_at)
             db.session.commit()
+            invalidate_entitlements(int(user_id))
         return jsonify(
             status="ok",
             message="Payment completed successfully and course unlocked",
@@ -163,7 +160,7 @@ def approve_instructor_payment():
         if not payment_id:
             return jsonify(status="error", message="Missing paymentId"), 400
 
-        response = requests.post(f"https://api.minepi.com/v2/payments/{payment_id}/approve", headers=HEADERS)
+        response = pi_client().approve_payment(payment_id)
         if response.status_code == 200:
             return jsonify(status="ok", message="Payment approved"), 200
         else:
@@ -187,12 +184,7 @@ def complete_instructor_payment():
             return jsonify(status="error", message="Missing paymentId or txid"), 400
 
         # Complete payment in Pi API
-        complete_data = {'txid': txid}
-        response = requests.post(
-            f"https://api.minepi.com/v2/payments/{payment_id}/complete",
-            headers={**HEADERS, 'Content-Type': 'application/json'},
-            json=complete_data
-        )
+        response = pi_client().complete_payment(payment_id, txid)
 
         if response.status_code != 200:
             return jsonify(status="error", message="Pi API completion failed", details=response.text), response.status_code
@@ -219,6 +211,7 @@ def complete_instructor_payment():
             db.session.add(new_instructor)
 
         db.session.commit()
+        invalidate_identity(user.pi_uid)
 
         return jsonify({
             "status": "ok",
@@ -0,0 +1,90 @@
+import os
+import threading
+import time
+
+import requests
+from flask import current_app, has_app_context
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from .metrics import metrics
+
+
+class PiClient:
+    """Keep-alive client for the Pi Platform API.
+
+    Every call goes through one pooled ``requests.Session`` so the TCP+TLS
+    handshake is paid once per connection instead of once per request. Only
+    idempotent GETs are retried on 5xx/read errors; connection failures are
+    retried for every method because nothing reached the server.
+    """
+
+    BASE_URL = "https://api.minepi.com/v2"
+
+    def __init__(self, api_key=None, timeout=(3.05, 10), retries=2, backoff=0.3, pool_size=10):
+        self.api_key = api_key
+        self.timeout = timeout
+        self.session = requests.Session()
+        retry = Retry(
+            total=retries,
+            backoff_factor=backoff,
+            status_forcelist=(502, 503, 504),
+            allowed_methods=frozenset({"GET"}),
+            raise_on_status=False,
+        )
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+        self.session.mount("https://", adapter)
+
+    @classmethod
+    def from_config(cls, config):
+        return cls(
+            api_key=config.get("PI_API_KEY", os.getenv("apikey")),
+            timeout=(config.get("PI_API_CONNECT_TIMEOUT", 3.05), config.get("PI_API_READ_TIMEOUT", 10)),
+            retries=config.get("PI_API_RETRIES", 2),
+            pool_size=config.get("PI_API_POOL_SIZE", 10),
+        )
+
+    def _request(self, name, method, path, **kwargs):
+        kwargs.setdefault("timeout", self.timeout)
+        start = time.perf_counter()
+        try:
+            response = self.session.request(method, f"{self.BASE_URL}{path}", **kwargs)
+        except requests.exceptions.RequestException:
+            metrics.incr(f"pi_api.{name}.error")
+            raise
+        finally:
+            metrics.observe(f"pi_api.{name}", time.perf_counter() - start)
+        metrics.incr(f"pi_api.{name}.{response.status_code}")
+        return response
+
+    def _key_headers(self):
+        return {"Authorization": f"Key {self.api_key}"}
+
+    def me(self, access_token):
+        return self._request("me", "GET", "/me", headers={"Authorization": f"Bearer {access_token}"})
+
+    def approve_payment(self, payment_id):
+        return self._request("approve", "POST", f"/payments/{payment_id}/approve", headers=self._key_headers())
+
+    def complete_payment(self, payment_id, txid):
+        return self._request(
+            "complete", "POST", f"/payments/{payment_id}/complete",
+            headers=self._key_headers(), json={"txid": txid}
+        )
+
+
+_client = None
+_client_pid = None
+_client_lock = threading.Lock()
+
+
+def pi_client():
+    """Return this worker's PiClient, rebuilding it after a fork so pools are never shared."""
+    global _client, _client_pid
+    if _client is None or _client_pid != os.getpid():
+        with _client_lock:
+            if _client is None or _client_pid != os.getpid():
+                config = current_app.config if has_app_context() else {}
+                _client = PiClient.from_config(config)
+                _client_pid = os.getpid()
+    return _client
@@ -0,0 +1,206 @@
+import atexit
+import os
+import threading
+import time
+from datetime import datetime
+
+from flask import current_app
+from sqlalchemy.exc import SQLAlchemyError
+
+from extensions import db
+from .cache import TTLCache
+from .metrics import metrics
+from .sql import upsert_insert
+
+# lecture_id -> course_id; lectures never move between courses
+_lecture_courses = TTLCache(maxsize=65536)
+
+
+def lecture_course_id(lecture_id):
+    """Course of a lecture, cached so heartbeats do not touch the database."""
+    from models import Lecture, Section
+    course_id = _lecture_courses.get(lecture_id)
+    if course_id is None:
+        course_id = (
+            db.session.query(Section.course_id)
+            .join(Lecture, Lecture.section_id == Section.id)
+            .filter(Lecture.id == lecture_id)
+            .scalar()
+        )
+        if course_id is not None:
+            _lecture_courses.set(lecture_id, course_id, 3600)
+    return course_id
+
+
+class PlaybackBuffer:
+    """Write-behind buffer for playback heartbeats.
+
+    Heartbeats for the same (user, lecture) overwrite each other in memory,
+    and a background thread writes whatever is pending every
+    ``flush_interval`` seconds as one batched upsert. At most ``maxsize``
+    positions are held; the heartbeat that fills the buffer flushes it inline.
+    Pending positions are also written when the process exits. Each worker
+    has its own buffer, so another worker may serve a position up to one
+    interval old.
+    """
+
+    def __init__(self, app, maxsize=10000, flush_interval=5, batch_size=500):
+        self.app = app
+        self.maxsize = maxsize
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self._pending = {}   # user_id -> {lecture_id: (course_id, position, duration, updated_at)}
+        self._inflight = {}  # the batch being written, still visible to readers
+        self._size = 0
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._flusher_pid = None
+        self._flusher_lock = threading.Lock()
+
+    @classmethod
+    def from_config(cls, app):
+        return cls(
+            app,
+            maxsize=app.config.get("PLAYBACK_BUFFER_SIZE", 10000),
+            flush_interval=app.config.get("PLAYBACK_FLUSH_INTERVAL", 5),
+        )
+
+    def record(self, user_id, lecture_id, course_id, position, duration=None):
+        self._ensure_flusher()
+        with self._lock:
+            entries = self._pending.setdefault(user_id, {})
+            if lecture_id not in entries:
+                self._size += 1
+            entries[lecture_id] = (course_id, position, duration, datetime.utcnow())
+            full = self._size >= self.maxsize
+        metrics.incr("playback.heartbeat")
+        if full:
+            metrics.incr("playback.forced_flush")
+            self.flush()
+
+    def pending_for(self, user_id, course_id):
+        """Unflushed ``{lecture_id: (position, duration, updated_at)}`` of one user in one course."""
+        with self._lock:
+            merged = dict(self._inflight.get(user_id, {}))
+            merged.update(self._pending.get(user_id, {}))
+        return {
+            lecture_id: entry[1:]
+            for lecture_id, entry in merged.items()
+            if entry[0] == course_id
+        }
+
+    def pending_count(self):
+        with self._lock:
+            return self._size
+
+    def flush(self):
+        """Write every pending position in batched transactions; returns how many were written."""
+        with self._flush_lock:
+            with self._lock:
+                batch, self._pending, self._size = self._pending, {}, 0
+                self._inflight = batch
+            rows = [
+                {
+                    "user_id": user_id,
+                    "lecture_id": lecture_id,
+                    "course_id": course_id,
+                    "position": position,
+                    "duration": duration,
+                    "updated_at": updated_at,
+                }
+                for user_id, entries in batch.items()
+                for lecture_id, (course_id, position, duration, updated_at) in entries.items()
+            ]
+            if not rows:
+                return 0
+
+            start = time.perf_counter()
+            try:
+                with self.app.app_context():
+                    for i in range(0, len(rows), self.batch_size):
+                        _write_positions(rows[i:i + self.batch_size])
+                    db.session.commit()
+            except SQLAlchemyError as e:
+                print(f"[playback] Flush failed: {e}")
+                self._requeue(batch)
+                return 0
+            finally:
+                with self._lock:
+                    self._inflight = {}
+                metrics.observe("playback.flush", time.perf_counter() - start)
+            metrics.incr("playback.flushed", len(rows))
+            return len(rows)
+
+    def _requeue(self, batch):
+        # Newer heartbeats win; whatever no longer fits is dropped
+        with self._lock:
+            for user_id, entries in batch.items():
+                current = self._pending.setdefault(user_id, {})
+                for lecture_id, entry in entries.items():
+                    if lecture_id in current:
+                        continue
+                    if self._size >= self.maxsize:
+                        metrics.incr("playback.dropped")
+                        continue
+                    current[lecture_id] = entry
+                    self._size += 1
+
+    def _ensure_flusher(self):
+        # One flusher per worker process; started lazily so it survives gunicorn's fork.
+        # Checked again under the lock so concurrent first heartbeats start only one.
+        if self._flusher_pid == os.getpid():
+            return
+        with self._flusher_lock:
+            if self._flusher_pid == os.getpid():
+                return
+            threading.Thread(target=self._flush_forever, name="playback-flusher", daemon=True).start()
+            self._flusher_pid = os.getpid()
+
+    def _flush_forever(self):
+        while True:
+            time.sleep(self.flush_interval)
+            self.flush()
+
+
+def _write_positions(rows):
+    from models import PlaybackPosition
+    insert = upsert_insert(PlaybackPosition)
+    if insert is not None:
+        insert = insert.values(rows)
+        db.session.execute(insert.on_conflict_do_update(
+            index_elements=["user_id", "lecture_id"],
+            set_={
+                "course_id": insert.excluded.course_id,
+                "position": insert.excluded.position,
+                "duration": insert.excluded.duration,
+                "updated_at": insert.excluded.updated_at,
+            },
+        ))
+        return
+    for row in rows:
+        db.session.merge(PlaybackPosition(**row))
+
+
+def playback_buffer():
+    buffer = current_app.extensions.get("playback_buffer")
+    if buffer is None:
+        buffer = current_app.extensions.setdefault(
+            "playback_buffer", PlaybackBuffer.from_config(current_app._get_current_object())
+        )
+        # Flushing twice at exit is harmless, losing the tail of the buffer is not
+        atexit.register(buffer.flush)
+    return buffer
+
+
+def course_positions(user_id, course_id):
+    """Saved positions of a user in a course, including heartbeats not yet flushed."""
+    from models import PlaybackPosition
+    rows = (
+        db.session.query(PlaybackPosition.lecture_id, PlaybackPosition.position,
+                         PlaybackPosition.duration, PlaybackPosition.updated_at)
+        .filter(PlaybackPosition.user_id == user_id, PlaybackPosition.course_id == course_id)
+        .all()
+    )
+    positions = {lecture_id: (position, duration, updated_at) for lecture_id, position, duration, updated_at in rows}
+    positions.update(playback_buffer().pending_for(user_id, course_id))
+    return positions
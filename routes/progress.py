@@ -1,16 +1,87 @@
+import math
+from collections import Counter
+from datetime import datetime
+
 from flask import Blueprint, request, jsonify
 from extensions import db   
+from sqlalchemy import and_, func, update
 
 from .utils import verify_pi_token  # Add this import
+from .identity import resolve_identity
+from .sql import aggregate_ids, upsert_insert
+from .progress_summary import apply_progress_deltas, get_progress_summary
+from .playback import course_positions, lecture_course_id, playback_buffer
 
 bp = Blueprint('progress', __name__)
 
+MAX_BATCH_LECTURES = 500
+
+
+def save_progress(user_id, lecture_courses, completed=True):
+    """Upsert progress rows for ``{lecture_id: course_id}`` and update the course summaries.
+
+    Relies on the unique (user_id, lecture_id) constraint. Only rows whose
+    completed flag actually changes are returned by the write, and those
+    drive the per-course counter deltas, so repeated or concurrent calls for
+    the same lecture never double count. Backends without ``ON CONFLICT``
+    fall back to one lookup per lecture.
+    """
+    from models import Progress
+    now = datetime.utcnow()
+    rows = [
+        {"user_id": user_id, "course_id": course_id, "lecture_id": lecture_id, "completed": completed, "updated_at": now}
+        for lecture_id, course_id in lecture_courses.items()
+    ]
+    if not rows:
+        return
+
+    insert = upsert_insert(Progress)
+    if insert is not None and completed:
+        # New rows and rows flipping to completed come back; already-completed ones are left alone
+        insert = insert.values(rows)
+        changed = db.session.execute(insert.on_conflict_do_update(
+            index_elements=["user_id", "lecture_id"],
+            set_={
+                "completed": insert.excluded.completed,
+                "course_id": insert.excluded.course_id,
+                "updated_at": insert.excluded.updated_at,
+            },
+            where=Progress.completed.isnot(True),
+        ).returning(Progress.course_id)).all()
+        deltas = Counter(course_id for course_id, in changed)
+    elif insert is not None:
+        changed = db.session.execute(
+            update(Progress)
+            .where(Progress.user_id == user_id, Progress.lecture_id.in_(lecture_courses), Progress.completed.is_(True))
+            .values(completed=False, updated_at=now)
+            .returning(Progress.course_id)
+            .execution_options(synchronize_session=False)
+        ).all()
+        db.session.execute(insert.values(rows).on_conflict_do_nothing(index_elements=["user_id", "lecture_id"]))
+        deltas = Counter()
+        for course_id, in changed:
+            deltas[course_id] -= 1
+    else:
+        deltas = Counter()
+        for row in rows:
+            progress = Progress.query.filter_by(user_id=user_id, lecture_id=row["lecture_id"]).first()
+            if progress is None:
+                db.session.add(Progress(**row))
+                deltas[row["course_id"]] += 1 if completed else 0
+            elif bool(progress.completed) != completed:
+                progress.completed = completed
+                deltas[row["course_id"]] += 1 if completed else -1
+
+    # The last lecture of each course in request order becomes its resume point
+    apply_progress_deltas(user_id, deltas, {course_id: lecture_id for lecture_id, course_id in lecture_courses.items()})
+
+
 # ----------------------
 # Mark lecture as completed
 # ----------------------
 @bp.route('/update', methods=['PATCH'])
 def update_progress():
-    from models import Progress, Lecture, User
+    from models import Lecture, Section
     data = request.get_json()
 
     access_token = data.get("accessToken")
@@ -23,50 +94,95 @@ def update_progress():
     if not user_data:
         return jsonify({"success": False, "error": "Invalid Pi token"}), 401
 
-    user = User.query.filter_by(pi_uid=user_data["uid"]).first()
-    if not user:
+    identity = resolve_identity(user_data)
+    if not identity:
         return jsonify({"success": False, "error": "User not found"}), 404
 
-    lecture = Lecture.query.get(lecture_id)
+    # Lecture and its course in one query
+    lecture = (
+        db.session.query(Lecture.id, Section.course_id)
+        .outerjoin(Section, Section.id == Lecture.section_id)
+        .filter(Lecture.id == lecture_id)
+        .first()
+    )
     if not lecture:
         return jsonify({"success": False, "error": "Lecture not found"}), 404
 
-    # Get course_id from section
-    course_id = lecture.section.course_id if lecture.section else None
+    course_id = lecture.course_id
     if not course_id:
         return jsonify({"success": False, "error": "Lecture not linked to a course"}), 500
 
-    # Check if progress exists
-    progress = Progress.query.filter_by(
-        user_id=user.id,
-        course_id=course_id,
-        lecture_id=lecture_id
-    ).first()
-
-    if not progress:
-        progress = Progress(
-            user_id=user.id,
-            course_id=course_id,
-            lecture_id=lecture_id,
-            completed=True
-        )
-        db.session.add(progress)
-    else:
-        progress.completed = True
-
+    save_progress(identity.user_id, {lecture.id: course_id})
     db.session.commit()
 
     return jsonify({"success": True, "message": "Lecture marked as completed"}), 200
 
 
+# ----------------------
+# Mark many lectures at once
+# ----------------------
+@bp.route('/batch', methods=['PATCH'])
+def update_progress_batch():
+    """Mark up to MAX_BATCH_LECTURES lectures in one request (offline catch-up, whole sections).
+
+    Body: ``{"accessToken", "lecture_ids": [...], "completed": true}``. Ids that
+    do not exist or are not linked to a course are returned under ``skipped``.
+    """
+    from models import Lecture, Section
+    data = request.get_json()
+
+    access_token = data.get("accessToken")
+    lecture_ids = data.get("lecture_ids")
+    completed = bool(data.get("completed", True))
+
+    if not access_token or not isinstance(lecture_ids, list) or not lecture_ids:
+        return jsonify({"success": False, "error": "Missing fields"}), 400
+    try:
+        lecture_ids = list(dict.fromkeys(int(i) for i in lecture_ids))
+    except (TypeError, ValueError):
+        return jsonify({"success": False, "error": "lecture_ids must be integers"}), 400
+    if len(lecture_ids) > MAX_BATCH_LECTURES:
+        return jsonify({"success": False, "error": f"At most {MAX_BATCH_LECTURES} lectures per request"}), 400
+
+    user_data = verify_pi_token(access_token)
+    if not user_data:
+        return jsonify({"success": False, "error": "Invalid Pi token"}), 401
+
+    identity = resolve_identity(user_data)
+    if not identity:
+        return jsonify({"success": False, "error": "User not found"}), 404
+
+    found = dict(
+        db.session.query(Lecture.id, Section.course_id)
+        .join(Section, Section.id == Lecture.section_id)
+        .filter(Lecture.id.in_(lecture_ids))
+        .all()
+    )
+    # Keep the request's order: save_progress takes each course's last lecture as its resume point
+    lecture_courses = {i: found[i] for i in lecture_ids if i in found}
+
+    save_progress(identity.user_id, lecture_courses, completed=completed)
+    db.session.commit()
+
+    return jsonify({
+        "success": True,
+        "updated": len(lecture_courses),
+        "course_ids": sorted(set(lecture_courses.values())),
+        "skipped": [i for i in lecture_ids if i not in lecture_courses]
+    }), 200
+
+
 # ----------------------
 # Get course progress
 # ----------------------
 @bp.route('/<int:course_id>', methods=['POST'])
 def course_progress(course_id):
-    from models import Progress, Lecture, Section, User
+    """Counters come from the course_progress_summary row; send ``"include_lecture_ids": false``
+    to skip loading ``completed_lecture_ids`` when only the counters are needed."""
+    from models import Progress
     data = request.get_json()
     access_token = data.get("accessToken")
+    include_ids = data.get("include_lecture_ids", True)
 
     if not access_token:
         return jsonify({"success": False, "error": "No access token provided"}), 400
@@ -75,29 +191,177 @@ def course_progress(course_id):
     if not user_data:
         return jsonify({"success": False, "error": "Invalid token"}), 401
 
-    user = User.query.filter_by(pi_uid=user_data["uid"]).first()
-    if not user:
+    identity = resolve_identity(user_data)
+    if not identity:
         return jsonify({"success": False, "error": "User not found"}), 404
 
-    # Get all lectures under this course
-    lecture_ids = [l.id for l in Lecture.query.join(Section).filter(Section.course_id == course_id).all()]
-
-    # Get user's progress
-    progress_entries = Progress.query.filter(
-        Progress.user_id == user.id,
-        Progress.lecture_id.in_(lecture_ids)
-    ).all()
-
-    completed_lecture_ids = [p.lecture_id for p in progress_entries if p.completed]
-    completed_lectures = len(completed_lecture_ids)
-    total_lectures = len(lecture_ids)
+    summary = get_progress_summary(identity.user_id, course_id)
+    completed_lectures = summary.completed_count
+    total_lectures = summary.total_lectures
     progress_percentage = (completed_lectures / total_lectures * 100) if total_lectures > 0 else 0
 
-    return jsonify({
+    result = {
         "success": True,
         "course_id": course_id,
         "completed_lectures": completed_lectures,
         "total_lectures": total_lectures,
         "progress_percentage": round(progress_percentage),
-        "completed_lecture_ids": completed_lecture_ids
+        "last_lecture_id": summary.last_lecture_id
+    }
+    if include_ids:
+        rows = db.session.query(Progress.lecture_id).filter(
+            Progress.user_id == identity.user_id,
+            Progress.course_id == course_id,
+            Progress.completed.is_(True)
+        ).all()
+        result["completed_lecture_ids"] = [lecture_id for lecture_id, in rows]
+    return jsonify(result), 200
+
+
+# ----------------------
+# Progress of every enrolled course
+# ----------------------
+@bp.route('/summary', methods=['POST'])
+def progress_summary():
+    """Counts, percentage and completed lecture ids for all of the user's enrolled courses.
+
+    One grouped query over Course -> Section -> Lecture, left joined to the
+    user's completed Progress rows. Send ``"include_lecture_ids": false`` to
+    leave out the id lists.
+    """
+    from models import Course, Lecture, Progress, Purchase, Section
+    data = request.get_json()
+    access_token = data.get("accessToken")
+    include_ids = data.get("include_lecture_ids", True)
+
+    if not access_token:
+        return jsonify({"success": False, "error": "No access token provided"}), 400
+
+    user_data = verify_pi_token(access_token)
+    if not user_data:
+        return jsonify({"success": False, "error": "Invalid token"}), 401
+
+    identity = resolve_identity(user_data)
+    if not identity:
+        return jsonify({"success": False, "error": "User not found"}), 404
+
+    completed_ids = aggregate_ids(Progress.lecture_id) if include_ids else None
+    columns = [Course.id, func.count(Lecture.id), func.count(Progress.lecture_id)]
+    if completed_ids is not None:
+        columns.append(completed_ids)
+
+    purchased = db.session.query(Purchase.course_id).filter(Purchase.user_id == identity.user_id)
+    rows = (
+        db.session.query(*columns)
+        .outerjoin(Section, Section.course_id == Course.id)
+        .outerjoin(Lecture, Lecture.section_id == Section.id)
+        .outerjoin(Progress, and_(
+            Progress.lecture_id == Lecture.id,
+            Progress.user_id == identity.user_id,
+            Progress.completed.is_(True)
+        ))
+        .filter(Course.id.in_(purchased))
+        .group_by(Course.id)
+        .all()
+    )
+
+    if include_ids and completed_ids is None:
+        # No string aggregate on this backend: fetch the ids in one more query
+        lecture_ids = {}
+        for course_id, lecture_id in db.session.query(Progress.course_id, Progress.lecture_id).filter(
+            Progress.user_id == identity.user_id, Progress.completed.is_(True), Progress.course_id.in_(purchased)
+        ):
+            lecture_ids.setdefault(course_id, []).append(lecture_id)
+
+    courses = {}
+    for row in rows:
+        course_id, total_lectures, completed_lectures = row[:3]
+        progress_percentage = (completed_lectures / total_lectures * 100) if total_lectures > 0 else 0
+        summary = {
+            "course_id": course_id,
+            "completed_lectures": completed_lectures,
+            "total_lectures": total_lectures,
+            "progress_percentage": round(progress_percentage)
+        }
+        if include_ids and completed_ids is not None:
+            summary["completed_lecture_ids"] = sorted(int(i) for i in (row[3] or "").split(",") if i)
+        elif include_ids:
+            summary["completed_lecture_ids"] = sorted(lecture_ids.get(course_id, []))
+        courses[str(course_id)] = summary
+
+    return jsonify({"success": True, "courses": courses}), 200
+
+
+# ----------------------
+# Playback heartbeats (resume where you left off)
+# ----------------------
+@bp.route('/heartbeat', methods=['POST'])
+def playback_heartbeat():
+    """Record the player position of a lecture; buffered in memory and written in batches.
+
+    Body: ``{"accessToken", "lecture_id", "position", "duration"}`` with times in
+    seconds. Also accepts the text/plain bodies sent by ``navigator.sendBeacon``.
+    """
+    data = request.get_json(force=True, silent=True)
+    if not isinstance(data, dict):
+        return jsonify({"success": False, "error": "Expected a JSON object"}), 400
+    access_token = data.get("accessToken")
+    lecture_id = data.get("lecture_id")
+
+    try:
+        lecture_id = int(lecture_id)
+        position = float(data.get("position"))
+        duration = float(data["duration"]) if data.get("duration") is not None else None
+    except (TypeError, ValueError, OverflowError):
+        return jsonify({"success": False, "error": "lecture_id and position are required"}), 400
+    # JSON parsing accepts NaN and Infinity, which would poison the stored positions
+    if not math.isfinite(position) or (duration is not None and not math.isfinite(duration)):
+        return jsonify({"success": False, "error": "position and duration must be finite"}), 400
+    if not isinstance(access_token, str) or not access_token or position < 0:
+        return jsonify({"success": False, "error": "Missing fields"}), 400
+
+    user_data = verify_pi_token(access_token)
+    if not user_data:
+        return jsonify({"success": False, "error": "Invalid Pi token"}), 401
+
+    identity = resolve_identity(user_data)
+    if not identity:
+        return jsonify({"success": False, "error": "User not found"}), 404
+
+    course_id = lecture_course_id(lecture_id)
+    if course_id is None:
+        return jsonify({"success": False, "error": "Lecture not found"}), 404
+
+    playback_buffer().record(identity.user_id, lecture_id, course_id, position, duration)
+    return jsonify({"success": True}), 202
+
+
+@bp.route('/positions/<int:course_id>', methods=['POST'])
+def playback_positions(course_id):
+    """Every saved playback position of the user in a course, keyed by lecture id."""
+    data = request.get_json()
+    access_token = data.get("accessToken")
+
+    if not access_token:
+        return jsonify({"success": False, "error": "No access token provided"}), 400
+
+    user_data = verify_pi_token(access_token)
+    if not user_data:
+        return jsonify({"success": False, "error": "Invalid token"}), 401
+
+    identity = resolve_identity(user_data)
+    if not identity:
+        return jsonify({"success": False, "error": "User not found"}), 404
+
+    positions = course_positions(identity.user_id, course_id)
+    return jsonify({
+        "success": True,
+        "course_id": course_id,
+        "positions": {
+            str(lecture_id): {
+                "position": position,
+                "duration": duration,
+                "updated_at": updated_at.isoformat()
+            } for lecture_id, (position, duration, updated_at) in positions.items()
+        }
     }), 200
@@ -0,0 +1,93 @@
+from collections import namedtuple
+from datetime import datetime
+
+from sqlalchemy import func, select, update
+
+from extensions import db
+from .sql import upsert_insert
+
+ProgressSummary = namedtuple("ProgressSummary", ["completed_count", "total_lectures", "last_lecture_id"])
+
+
+def _lecture_count(course_id):
+    from models import Lecture, Section
+    return (
+        select(func.count(Lecture.id))
+        .join(Section, Section.id == Lecture.section_id)
+        .where(Section.course_id == course_id)
+        .scalar_subquery()
+    )
+
+
+def apply_progress_deltas(user_id, deltas, last_lectures):
+    """Add ``{course_id: delta}`` to a user's completed counters inside the current transaction.
+
+    Missing rows are created with the course's current lecture count; every
+    touched course also records ``last_lectures[course_id]`` as the most
+    recently updated lecture.
+    """
+    from models import CourseProgressSummary
+    now = datetime.utcnow()
+    rows = [
+        {
+            "user_id": user_id,
+            "course_id": course_id,
+            "completed_count": deltas.get(course_id, 0),
+            "total_lectures": _lecture_count(course_id),
+            "last_lecture_id": lecture_id,
+            "updated_at": now,
+        }
+        for course_id, lecture_id in last_lectures.items()
+    ]
+    if not rows:
+        return
+
+    insert = upsert_insert(CourseProgressSummary)
+    if insert is not None:
+        insert = insert.values(rows)
+        db.session.execute(insert.on_conflict_do_update(
+            index_elements=["user_id", "course_id"],
+            set_={
+                "completed_count": CourseProgressSummary.completed_count + insert.excluded.completed_count,
+                "last_lecture_id": insert.excluded.last_lecture_id,
+                "updated_at": insert.excluded.updated_at,
+            },
+        ))
+        return
+
+    for row in rows:
+        summary = db.session.get(CourseProgressSummary, (user_id, row["course_id"]))
+        if summary is None:
+            row["total_lectures"] = db.session.scalar(select(row["total_lectures"]))
+            db.session.add(CourseProgressSummary(**row))
+        else:
+            summary.completed_count += row["completed_count"]
+            summary.last_lecture_id = row["last_lecture_id"]
+
+
+def adjust_total_lectures(course_id, delta):
+    """Shift every learner's lecture total after lectures are added to or removed from a course."""
+    from models import CourseProgressSummary
+    db.session.execute(
+        update(CourseProgressSummary)
+        .where(CourseProgressSummary.course_id == course_id)
+        .values(total_lectures=CourseProgressSummary.total_lectures + delta)
+        .execution_options(synchronize_session=False)
+    )
+
+
+def get_progress_summary(user_id, course_id):
+    """Counters for one user and course: a primary-key lookup, or a lecture count if not started."""
+    from models import CourseProgressSummary
+    row = (
+        db.session.query(
+            CourseProgressSummary.completed_count,
+            CourseProgressSummary.total_lectures,
+            CourseProgressSummary.last_lecture_id,
+        )
+        .filter_by(user_id=user_id, course_id=course_id)
+        .first()
+    )
+    if row is not None:
+        return ProgressSummary(*row)
+    return ProgressSummary(0, db.session.scalar(select(_lecture_count(course_id))), None)
@@ -0,0 +1,105 @@
+import math
+from datetime import datetime
+
+from flask import current_app
+from sqlalchemy import case, update
+
+from extensions import db
+
+# Trending scores are log-space sums of exp(rate * seconds since this instant).
+# Changing it invalidates every stored score until the next rollup.
+TRENDING_EPOCH = datetime(2024, 1, 1)
+
+# Only payments verified with the Pi API; 'confirmed' rows hold an unchecked client tx_id
+PAID_STATUSES = ('completed',)
+
+
+def bayesian_score(rating_sum, rating_count):
+    """SQL expression for the smoothed rating ``(C*m + sum) / (C + count)``.
+
+    ``m`` (RATING_PRIOR_MEAN) is the rating assumed for a course nobody has
+    rated and ``C`` (RATING_PRIOR_WEIGHT) how many real ratings it takes to
+    outweigh it, so a single 5-star review does not top the catalog. Courses
+    without ratings score 0 and list last.
+    """
+    weight = float(current_app.config.get("RATING_PRIOR_WEIGHT", 10))
+    mean = float(current_app.config.get("RATING_PRIOR_MEAN", 3.5))
+    return case(
+        (rating_count > 0, (weight * mean + rating_sum) / (weight + rating_count)),
+        else_=0.0,
+    )
+
+
+def _decay_rate():
+    half_life = current_app.config.get("TRENDING_HALF_LIFE_DAYS", 7) * 86400
+    return math.log(2) / half_life
+
+
+def _logaddexp(a, b):
+    high, low = max(a, b), min(a, b)
+    return high + math.log1p(math.exp(low - high))
+
+
+def trending_point(when, rate):
+    """Log-space weight of one purchase made at ``when``."""
+    return rate * (when - TRENDING_EPOCH).total_seconds()
+
+
+def record_purchase_score(course_id, when=None):
+    """Add one purchase to a course's trending score inside the current transaction.
+
+    The score is ``log(sum(exp(rate * t_i)))`` over purchase times ``t_i``, so
+    decaying every course by the same factor never changes their order and
+    nothing has to be rewritten as time passes; a new purchase is one
+    ``logaddexp``. 0 means no purchases.
+    """
+    from models import Course
+    point = trending_point(when or datetime.utcnow(), _decay_rate())
+    current = (
+        db.session.query(Course.trending_score)
+        .filter(Course.id == course_id)
+        .with_for_update()
+        .scalar()
+    )
+    score = _logaddexp(current, point) if current else point
+    db.session.execute(
+        update(Course).where(Course.id == course_id).values(trending_score=score)
+        .execution_options(synchronize_session=False)
+    )
+
+
+def rollup_scores():
+    """Recompute both ranking columns of every course from ratings and purchases.
+
+    The write paths keep the scores current; this repairs drift (lost
+    concurrent updates, edited purchases) and applies changed prior or
+    half-life settings. Returns how many courses have a trending score.
+    """
+    from models import Course, Purchase
+    db.session.execute(
+        update(Course).values(rating_score=bayesian_score(Course.rating_sum, Course.rating_count))
+        .execution_options(synchronize_session=False)
+    )
+
+    rate = _decay_rate()
+    scores = {}
+    purchases = (
+        db.session.query(Purchase.course_id, Purchase.created_at)
+        .filter(Purchase.status.in_(PAID_STATUSES), Purchase.created_at.isnot(None))
+        .yield_per(1000)
+    )
+    for course_id, created_at in purchases:
+        point = trending_point(created_at, rate)
+        current = scores.get(course_id)
+        scores[course_id] = point if current is None else _logaddexp(current, point)
+
+    db.session.execute(
+        update(Course).values(trending_score=0).execution_options(synchronize_session=False)
+    )
+    if scores:
+        db.session.execute(
+            update(Course),
+            [{"id": course_id, "trending_score": score} for course_id, score in scores.items()],
+        )
+    db.session.commit()
+    return len(scores)
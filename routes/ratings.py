@@ -2,26 +2,65 @@ from flask import Blueprint, request, jsonify
 from extensions import db   
 from datetime import datetime
 
+from sqlalchemy import and_, or_, update
+
 from .utils import verify_pi_token  # Add this import
+from .identity import resolve_identity
+from .pagination import decode_cursor, encode_cursor
+from .rankings import bayesian_score
+from .sql import upsert_insert
 
 
 bp = Blueprint("ratings", __name__, url_prefix="/api/ratings")
 
+REVIEWS_PAGE_SIZE = 20
+REVIEWS_MAX_PAGE_SIZE = 100
+
+
+def _apply_rating_delta(course_id, old, new):
+    """Move a course's rating aggregates from ``old`` (None for a first rating) to ``new``.
+
+    Written as column increments so concurrent ratings of the same course
+    never overwrite each other's counts; the top-rated score is recomputed
+    from the same new totals.
+    """
+    from models import Course
+    values = {"rating_sum": Course.rating_sum + (new - (old or 0))}
+    if old is None:
+        values["rating_count"] = Course.rating_count + 1
+    values["rating_score"] = bayesian_score(values["rating_sum"], values.get("rating_count", Course.rating_count))
+    if old != new:
+        if old is not None:
+            column = f"rating_hist_{old}"
+            values[column] = getattr(Course, column) - 1
+        column = f"rating_hist_{new}"
+        values[column] = getattr(Course, column) + 1
+    db.session.execute(
+        update(Course).where(Course.id == course_id).values(**values).execution_options(synchronize_session=False)
+    )
+
 # -----------------------------
 # Add or update rating
 # -----------------------------
 @bp.route("/add", methods=["POST"])
 def add_rating():
-    from models import Rating, User, Course
+    from models import Rating, Course
     data = request.get_json()
     access_token = data.get("accessToken")
     course_id = data.get("course_id")
     rating_value = data.get("rating")
-    review = data.get("review", "").strip()
+    review = (data.get("review") or "").strip()
 
     if not all([access_token, course_id, rating_value]):
         return jsonify({"success": False, "error": "Missing fields"}), 400
 
+    try:
+        rating_value = int(rating_value)
+    except (TypeError, ValueError):
+        rating_value = 0
+    if not 1 <= rating_value <= 5:
+        return jsonify({"success": False, "error": "Rating must be between 1 and 5"}), 400
+
     if review and len(review) > 100:
         return jsonify({"success": False, "error": "Review must be 100 characters or less"}), 400
 
@@ -29,52 +68,93 @@ def add_rating():
     if not user_data:
         return jsonify({"success": False, "error": "Invalid Pi token"}), 401
 
-    user = User.query.filter_by(pi_uid=user_data["uid"]).first()
-    if not user:
+    identity = resolve_identity(user_data)
+    if not identity:
         return jsonify({"success": False, "error": "User not found"}), 404
 
-    course = Course.query.get(course_id)
-    if not course:
+    if not db.session.query(Course.id).filter_by(id=course_id).first():
         return jsonify({"success": False, "error": "Course not found"}), 404
 
-    # Check if user already rated
-    existing = Rating.query.filter_by(user_id=user.id, course_id=course_id).first()
-    if existing:
-        existing.rating = rating_value
-        existing.review = review
-        existing.created_at = datetime.utcnow()
+    # Insert, or fall through to updating the user's existing rating
+    now = datetime.utcnow()
+    created = False
+    insert = upsert_insert(Rating)
+    if insert is not None:
+        created = db.session.execute(
+            insert.values(user_id=identity.user_id, course_id=course_id, rating=rating_value, review=review, created_at=now)
+            .on_conflict_do_nothing(index_elements=["user_id", "course_id"])
+            .returning(Rating.id)
+        ).first() is not None
+
+    if created:
+        old = None
     else:
-        new_rating = Rating(
-            user_id=user.id,
-            course_id=course_id,
-            rating=rating_value,
-            review=review
+        existing = (
+            Rating.query.filter_by(user_id=identity.user_id, course_id=course_id)
+            .with_for_update()
+            .first()
         )
-        db.session.add(new_rating)
-
+        if existing:
+            old = existing.rating
+            existing.rating = rating_value
+            existing.review = review
+            existing.created_at = now
+        else:
+            old = None
+            db.session.add(Rating(user_id=identity.user_id, course_id=course_id, rating=rating_value, review=review, created_at=now))
+
+    _apply_rating_delta(course_id, old, rating_value)
     db.session.commit()
     return jsonify({"success": True, "message": "Rating submitted"}), 200
 
 
 # -----------------------------
-# Get all ratings for a course
+# Rating summary and a page of reviews for a course
 # -----------------------------
 @bp.route("/get", methods=["GET"])
 def get_ratings():
+    """Aggregates come from the course row; reviews are paged newest first.
+
+    Query params: ``course_id``, ``limit`` and ``cursor`` (the ``next_cursor``
+    of the previous page).
+    """
     from models import Rating, Course
-    course_id = request.args.get("course_id")
+    course_id = request.args.get("course_id", type=int)
     if not course_id:
         return jsonify({"success": False, "error": "Missing course_id"}), 400
 
-    course = Course.query.get(course_id)
+    limit = min(max(request.args.get("limit", REVIEWS_PAGE_SIZE, type=int), 1), REVIEWS_MAX_PAGE_SIZE)
+    cursor = decode_cursor(request.args.get("cursor"))
+    if cursor is None:
+        return jsonify({"success": False, "error": "Invalid cursor"}), 400
+
+    histogram_columns = [getattr(Course, f"rating_hist_{stars}") for stars in range(1, 6)]
+    course = (
+        db.session.query(Course.rating_count, Course.rating_sum, *histogram_columns)
+        .filter(Course.id == course_id)
+        .first()
+    )
     if not course:
         return jsonify({"success": False, "error": "Course not found"}), 404
 
-    ratings = Rating.query.filter_by(course_id=course_id).all()
-    if not ratings:
-        return jsonify({"success": True, "ratings": [], "average_rating": 0}), 200
-
-    average = sum(r.rating for r in ratings) / len(ratings)
+    query = Rating.query.filter(Rating.course_id == course_id)
+    if cursor:
+        try:
+            created_at = datetime.fromisoformat(cursor["t"])
+            query = query.filter(or_(
+                Rating.created_at < created_at,
+                and_(Rating.created_at == created_at, Rating.id < int(cursor["i"]))
+            ))
+        except (KeyError, TypeError, ValueError):
+            return jsonify({"success": False, "error": "Invalid cursor"}), 400
+
+    ratings = query.order_by(Rating.created_at.desc(), Rating.id.desc()).limit(limit + 1).all()
+    next_cursor = None
+    if len(ratings) > limit:
+        ratings = ratings[:limit]
+        next_cursor = encode_cursor({"t": ratings[-1].created_at.isoformat(), "i": ratings[-1].id})
+
+    count, total = course.rating_count, course.rating_sum
     ratings_data = [
         {
             "user_id": r.user_id,
@@ -84,4 +164,11 @@ def get_ratings():
         } for r in ratings
     ]
 
-    return jsonify({"success": True, "ratings": ratings_data, "average_rating": round(average, 2)}), 200
+    return jsonify({
+        "success": True,
+        "ratings": ratings_data,
+        "average_rating": round(total / count, 2) if count else 0,
+        "rating_count": count,
+        "histogram": {str(stars): course[stars + 1] for stars in range(1, 6)},
+        "next_cursor": next_cursor
+    }), 200
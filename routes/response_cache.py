@@ -0,0 +1,137 @@
+import hashlib
+import sqlite3
+import time
+from functools import wraps
+
+from flask import current_app, has_app_context, make_response, request
+
+from .cache import TTLCache, SqliteStore
+from .metrics import metrics
+
+
+class VersionedCache:
+    """Response cache whose keys embed a per-scope version counter.
+
+    Bumping a scope (``course:<id>`` or ``catalog``) makes every entry cached
+    under its previous version unreachable, so writers never have to find and
+    delete keys. Versions live in the optional SQLite store when configured so
+    that a bump in one worker invalidates all of them; otherwise they are
+    per-process and entries only live for ``ttl`` seconds.
+    """
+
+    def __init__(self, maxsize=512, ttl=60, shared_path=None):
+        self.ttl = ttl
+        self.entries = TTLCache(maxsize)
+        self.shared = SqliteStore(shared_path, table="response_cache") if shared_path else None
+        self._versions = {}
+        # Local versions start from a boot nonce so they never repeat across restarts
+        self._boot = format(time.time_ns(), "x")
+
+    @classmethod
+    def from_config(cls, config):
+        return cls(
+            maxsize=config.get("RESPONSE_CACHE_SIZE", 512),
+            ttl=config.get("RESPONSE_CACHE_TTL", 60),
+            shared_path=config.get("RESPONSE_CACHE_PATH"),
+        )
+
+    def version(self, scope):
+        if self.shared is not None:
+            try:
+                return self.shared.get(f"v:{scope}", "0")
+            except sqlite3.Error as e:
+                print(f"[VersionedCache] Shared store error: {e}")
+        return f"{self._boot}.{self._versions.get(scope, 0)}"
+
+    def bump(self, scope):
+        self._versions[scope] = self._versions.get(scope, 0) + 1
+        if self.shared is not None:
+            try:
+                # Versions must outlive every entry cached under them
+                self.shared.set(f"v:{scope}", format(time.time_ns(), "x"), 365 * 24 * 3600)
+            except sqlite3.Error as e:
+                print(f"[VersionedCache] Shared store error: {e}")
+
+    def get(self, scope, key):
+        entry_key = f"{scope}@{self.version(scope)}:{key}"
+        entry = self.entries.get(entry_key)
+        if entry is None and self.shared is not None:
+            try:
+                shared = self.shared.get(entry_key)
+            except sqlite3.Error:
+                shared = None
+            if shared is not None:
+                entry = (shared[0].encode("utf-8"), shared[1], shared[2])
+                self.entries.set(entry_key, entry, self.ttl)
+        return entry
+
+    def set(self, scope, key, body, status, etag):
+        entry_key = f"{scope}@{self.version(scope)}:{key}"
+        self.entries.set(entry_key, (body, status, etag), self.ttl)
+        if self.shared is not None:
+            try:
+                self.shared.set(entry_key, [body.decode("utf-8"), status, etag], self.ttl)
+            except sqlite3.Error as e:
+                print(f"[VersionedCache] Shared store error: {e}")
+
+
+def response_cache():
+    cache = current_app.extensions.get("response_cache")
+    if cache is None:
+        cache = current_app.extensions.setdefault("response_cache", VersionedCache.from_config(current_app.config))
+    return cache
+
+
+def course_scope(course_id):
+    return f"course:{course_id}"
+
+
+def cached_response(scope):
+    """Serve a public JSON GET view from the response cache, with conditional GET.
+
+    ``scope`` maps the view's keyword arguments to the cache scope whose
+    version guards it; the full request path including the query string is
+    the key within that scope. Only 200 responses are stored, together with a
+    strong ETag of their body, so a matching ``If-None-Match`` is answered
+    with a 304 straight from the cache entry without running the view.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            cache = response_cache()
+            scope_name = scope(**kwargs)
+            key = request.full_path
+            hit = cache.get(scope_name, key)
+            if hit is not None:
+                metrics.incr("response_cache.hit")
+                body, status, etag = hit
+            else:
+                metrics.incr("response_cache.miss")
+                response = make_response(view(*args, **kwargs))
+                if response.status_code != 200 or not response.is_json:
+                    return response
+                body, status = response.get_data(), response.status_code
+                etag = hashlib.blake2b(body, digest_size=12).hexdigest()
+                cache.set(scope_name, key, body, status, etag)
+
+            if request.if_none_match.contains(etag):
+                metrics.incr("response_cache.not_modified")
+                response = current_app.response_class(status=304)
+            else:
+                response = current_app.response_class(body, status=status, mimetype="application/json")
+            response.set_etag(etag)
+            # Let browsers keep a copy but revalidate it on every use
+            response.headers["Cache-Control"] = current_app.config.get("PUBLIC_CACHE_CONTROL", "public, no-cache")
+            return response
+        return wrapper
+    return decorator
+
+
+def invalidate_course(course_id, catalog=False):
+    """Bump a course's version after its data changed; call after the commit."""
+    if not has_app_context():
+        return
+    cache = response_cache()
+    cache.bump(course_scope(course_id))
+    if catalog:
+        cache.bump("catalog")
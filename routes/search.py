@@ -0,0 +1,74 @@
+import re
+
+from sqlalchemy import func, or_, text
+
+from extensions import db
+
+_TOKEN = re.compile(r"\w+", re.UNICODE)
+_fts_ready = set()
+
+
+def _tokens(q):
+    return _TOKEN.findall(q.lower())[:8]
+
+
+def fts_available():
+    """True once the courses_fts migration has been applied to this SQLite database.
+
+    Only a positive answer is cached, so a migration applied while the app
+    runs is picked up on the next search.
+    """
+    url = db.engine.url
+    if url not in _fts_ready:
+        row = db.session.execute(
+            text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'courses_fts'")
+        ).first()
+        if row is None:
+            return False
+        _fts_ready.add(url)
+    return True
+
+
+def search_courses(query, q):
+    """Restrict a Course query to full-text matches for ``q``, best match first.
+
+    Every word is prefix-matched and all of them must appear in the title or
+    description. Uses the FTS5 index on SQLite and a tsvector expression on
+    Postgres; other backends fall back to a LIKE scan.
+    """
+    from models import Course
+    tokens = _tokens(q)
+    dialect = db.engine.dialect.name
+
+    if tokens and dialect == "sqlite" and fts_available():
+        match = " ".join(f'"{t}"*' for t in tokens)
+        hits = (
+            text("SELECT rowid AS course_id, bm25(courses_fts, 4.0, 1.0) AS rank FROM courses_fts WHERE courses_fts MATCH :match")
+            .bindparams(match=match)
+            .columns(course_id=db.Integer, rank=db.Float)
+            .subquery()
+        )
+        return query.join(hits, hits.c.course_id == Course.id).order_by(hits.c.rank)
+
+    if tokens and dialect == "postgresql":
+        vector = _pg_vector(Course)
+        tsquery = func.to_tsquery("simple", " & ".join(f"{t}:*" for t in tokens))
+        return query.filter(vector.op("@@")(tsquery)).order_by(func.ts_rank(vector, tsquery).desc())
+
+    return query.filter(or_(Course.title.ilike(f'%{q}%'), Course.description.ilike(f'%{q}%'))).order_by(Course.created_at.desc())
+
+
+def _pg_vector(Course):
+    # Must match the expression of the ix_courses_search GIN index
+    return func.to_tsvector("simple", Course.title + " " + func.coalesce(Course.description, ""))
+
+
+def index_course(course):
+    """Upsert a course into the FTS5 index; call inside the transaction that saves it."""
+    if db.engine.dialect.name != "sqlite" or not fts_available():
+        return  # Postgres indexes the expression itself
+    db.session.execute(text("DELETE FROM courses_fts WHERE rowid = :id"), {"id": course.id})
+    db.session.execute(
+        text("INSERT INTO courses_fts (rowid, title, description) VALUES (:id, :title, :description)"),
+        {"id": course.id, "title": course.title, "description": course.description or ""},
+    )
@@ -0,0 +1,56 @@
+import hashlib
+
+from flask import current_app
+from itsdangerous import BadSignature, URLSafeTimedSerializer
+
+SESSION_PREFIX = "lp1."
+REFRESH_PREFIX = "lpr1."
+
+
+def _serializer(salt):
+    return URLSafeTimedSerializer(
+        current_app.config["SECRET_KEY"],
+        salt=salt,
+        signer_kwargs={"digest_method": hashlib.sha256},
+    )
+
+
+def _claims(user):
+    return {"user_id": user.id, "uid": user.pi_uid, "username": user.username, "role": user.role or "student"}
+
+
+def issue_session_token(user):
+    """Short-lived, HMAC-signed token that every blueprint validates locally."""
+    return SESSION_PREFIX + _serializer("session-token").dumps(_claims(user))
+
+
+def issue_refresh_token(user):
+    """Long-lived token accepted only by /api/auth/refresh to mint a new session token."""
+    return REFRESH_PREFIX + _serializer("refresh-token").dumps({"user_id": user.id})
+
+
+def is_session_token(token):
+    return isinstance(token, str) and token.startswith(SESSION_PREFIX)
+
+
+def load_session_token(token):
+    """Return the claims of a valid session token, or None if it is forged or expired."""
+    if not is_session_token(token):
+        return None
+    try:
+        return _serializer("session-token").loads(
+            token[len(SESSION_PREFIX):], max_age=current_app.config.get("SESSION_TOKEN_TTL", 900)
+        )
+    except BadSignature:
+        return None
+
+
+def load_refresh_token(token):
+    if not isinstance(token, str) or not token.startswith(REFRESH_PREFIX):
+        return None
+    try:
+        return _serializer("refresh-token").loads(
+            token[len(REFRESH_PREFIX):], max_age=current_app.config.get("REFRESH_TOKEN_TTL", 30 * 24 * 3600)
+        )
+    except BadSignature:
+        return None
@@ -0,0 +1,25 @@
+from sqlalchemy import String, cast, func
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+from extensions import db
+
+
+def upsert_insert(model):
+    """An INSERT for ``model`` that supports ``on_conflict_do_*``, or None on other backends."""
+    dialect = db.engine.dialect.name
+    if dialect == "sqlite":
+        return sqlite_insert(model)
+    if dialect == "postgresql":
+        return pg_insert(model)
+    return None
+
+
+def aggregate_ids(column):
+    """Comma-separated list of a group's non-null ``column`` values, or None if the backend lacks one."""
+    dialect = db.engine.dialect.name
+    if dialect == "sqlite":
+        return func.group_concat(column)
+    if dialect == "postgresql":
+        return func.string_agg(cast(column, String), ",")
+    return None
@@ -1,18 +1,151 @@
+import hashlib
+import sqlite3
+import threading
+
 import requests
+from flask import current_app, has_app_context
+
+from .cache import TTLCache, SqliteStore, SingleFlight
+from .pi_client import pi_client
+from .session_tokens import is_session_token, load_session_token
+
+
+class TokenCache:
+    """Caches Pi token verifications, keyed by a hash of the token.
+
+    Valid tokens are kept for ``ttl`` seconds, rejected ones for the much
+    shorter ``negative_ttl``. Lookups go to the in-process LRU first and then
+    to the optional SQLite store shared by the other workers on the host.
+    """
+
+    INVALID = False
+
+    def __init__(self, ttl=300, negative_ttl=10, maxsize=4096, shared_path=None):
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.local = TTLCache(maxsize)
+        self.shared = SqliteStore(shared_path, table="pi_token_cache") if shared_path else None
+        self.hits = 0
+        self.negative_hits = 0
+        self.shared_hits = 0
+        self.misses = 0
+        self._writes = 0
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_config(cls, config):
+        return cls(
+            ttl=config.get("PI_TOKEN_CACHE_TTL", 300),
+            negative_ttl=config.get("PI_TOKEN_CACHE_NEGATIVE_TTL", 10),
+            maxsize=config.get("PI_TOKEN_CACHE_SIZE", 4096),
+            shared_path=config.get("PI_TOKEN_CACHE_PATH"),
+        )
+
+    @staticmethod
+    def key_for(access_token):
+        return hashlib.sha256(access_token.encode("utf-8")).hexdigest()
+
+    def _count(self, counter):
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+    def get(self, key):
+        """Return the cached Pi user, ``INVALID`` for a known-bad token, or None on a miss."""
+        value = self.local.get(key)
+        if value is None and self.shared is not None:
+            remaining = 0
+            try:
+                value, remaining = self.shared.get_with_ttl(key)
+            except sqlite3.Error as e:
+                print(f"[TokenCache] Shared store error: {e}")
+            if value is not None:
+                self._count("shared_hits")
+                # Expire with the shared entry, not a fresh full TTL
+                self.local.set(key, value, remaining)
+
+        if value is None:
+            self._count("misses")
+        elif value is self.INVALID:
+            self._count("negative_hits")
+        else:
+            self._count("hits")
+        return value
+
+    def set(self, key, pi_user):
+        self._store(key, pi_user, self.ttl)
+
+    def set_invalid(self, key):
+        self._store(key, self.INVALID, self.negative_ttl)
+
+    def _store(self, key, value, ttl):
+        self.local.set(key, value, ttl)
+        if self.shared is not None:
+            try:
+                self.shared.set(key, value, ttl)
+                self._writes += 1
+                if self._writes % 1000 == 0:
+                    self.shared.purge_expired()
+            except sqlite3.Error as e:
+                print(f"[TokenCache] Shared store error: {e}")
+
+    def stats(self):
+        lookups = self.hits + self.negative_hits + self.misses
+        return {
+            "hits": self.hits,
+            "negative_hits": self.negative_hits,
+            "shared_hits": self.shared_hits,
+            "misses": self.misses,
+            "hit_ratio": round((lookups - self.misses) / lookups, 4) if lookups else 0.0,
+            "size": len(self.local),
+        }
+
+
+def token_cache():
+    """Return the app's token cache, creating it on first use (None outside an app context)."""
+    if not has_app_context():
+        return None
+    cache = current_app.extensions.get("pi_token_cache")
+    if cache is None:
+        cache = current_app.extensions.setdefault("pi_token_cache", TokenCache.from_config(current_app.config))
+    return cache
+
+
+token_singleflight = SingleFlight()
+
 
 def verify_pi_token(access_token):
-    if not access_token:
+    """Return the user behind a Pi access token or a first-party session token, else None."""
+    # Tokens come straight from JSON bodies, so anything but a non-empty string is rejected
+    if not access_token or not isinstance(access_token, str):
         return None
+
+    # First-party session tokens are validated locally, without the cache or the Pi API
+    if is_session_token(access_token):
+        return load_session_token(access_token)
+
+    cache = token_cache()
+    key = TokenCache.key_for(access_token)
+    if cache is not None:
+        cached = cache.get(key)
+        if cached is not None:
+            return cached or None
+
+    # Parallel requests with the same token (e.g. a dashboard page load) share one upstream call
+    return token_singleflight.do(key, lambda: _fetch_pi_user(access_token, key, cache))
+
+
+def _fetch_pi_user(access_token, key, cache):
     try:
-        res = requests.get(
-            "https://api.minepi.com/v2/me",
-            headers={"Authorization": f"Bearer {access_token}"},
-            timeout=5
-        )
+        res = pi_client().me(access_token)
         if res.status_code == 200:
             data = res.json()
             if "uid" in data and "username" in data:
+                if cache is not None:
+                    cache.set(key, data)
                 return data
+        # Only cache definitive rejections, never outages, rate limits or odd payloads
+        if cache is not None and res.status_code in (401, 403):
+            cache.set_invalid(key)
     except requests.exceptions.RequestException as e:
         print(f"[verify_pi_token] Network error: {e}")
     return None
@@ -0,0 +1,238 @@
+import os
+import secrets
+import sqlite3
+import threading
+import time
+
+from flask.json.tag import TaggedJSONSerializer
+from flask.sessions import SessionInterface, SessionMixin
+from itsdangerous import BadSignature, Signer
+from werkzeug.datastructures import CallbackDict
+
+from routes.metrics import metrics
+
+
+class ServerSideSession(CallbackDict, SessionMixin):
+    def __init__(self, initial=None, sid=None, new=False, expiry=None):
+        def on_update(self):
+            self.modified = True
+
+        super().__init__(initial, on_update)
+        self.sid = sid
+        self.new = new
+        self.expiry = expiry
+        self.modified = False
+
+
+class MemorySessionStore:
+    """Dict-backed store for single-node deployments and development."""
+
+    def __init__(self):
+        self._data = {}
+        self._lock = threading.Lock()
+
+    def load(self, sid):
+        with self._lock:
+            entry = self._data.get(sid)
+        if entry is None or entry[1] <= time.time():
+            return None
+        return entry
+
+    def save(self, sid, payload, expiry):
+        with self._lock:
+            self._data[sid] = (payload, expiry)
+
+    def delete(self, sid):
+        with self._lock:
+            self._data.pop(sid, None)
+
+    def sweep(self, limit):
+        now = time.time()
+        with self._lock:
+            expired = [sid for sid, (_, expiry) in self._data.items() if expiry <= now][:limit]
+            for sid in expired:
+                del self._data[sid]
+        return len(expired)
+
+
+class SqliteSessionStore:
+    """All sessions in one WAL-mode SQLite table instead of one file per session."""
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        conn = self._conn()
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS sessions "
+            "(sid TEXT PRIMARY KEY, data BLOB NOT NULL, expiry REAL NOT NULL) WITHOUT ROWID"
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS ix_sessions_expiry ON sessions (expiry)")
+
+    def _conn(self):
+        # One connection per thread, reopened after a fork so workers never share one
+        conn = getattr(self._local, "conn", None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def load(self, sid):
+        row = self._conn().execute(
+            "SELECT data, expiry FROM sessions WHERE sid = ? AND expiry > ?", (sid, time.time())
+        ).fetchone()
+        return row
+
+    def save(self, sid, payload, expiry):
+        self._conn().execute(
+            "INSERT OR REPLACE INTO sessions (sid, data, expiry) VALUES (?, ?, ?)", (sid, payload, expiry)
+        )
+
+    def delete(self, sid):
+        self._conn().execute("DELETE FROM sessions WHERE sid = ?", (sid,))
+
+    def sweep(self, limit):
+        cur = self._conn().execute(
+            "DELETE FROM sessions WHERE sid IN (SELECT sid FROM sessions WHERE expiry <= ? LIMIT ?)",
+            (time.time(), limit),
+        )
+        return cur.rowcount
+
+
+class StoreSessionInterface(SessionInterface):
+    """Server-side sessions kept in a pluggable store, keyed by a signed random id.
+
+    The session body is written only when it changed, or when less than half of
+    its lifetime is left, so read-only requests cost a single indexed SELECT.
+    Expired rows are removed in batches by a background sweeper thread.
+    """
+
+    serializer = TaggedJSONSerializer()
+
+    def __init__(self, store, key_prefix="session:", use_signer=True, sweep_interval=300, sweep_batch=500):
+        self.store = store
+        self.key_prefix = key_prefix
+        self.use_signer = use_signer
+        self.sweep_interval = sweep_interval
+        self.sweep_batch = sweep_batch
+        self._sweeper_pid = None
+        self._sweeper_lock = threading.Lock()
+
+    def _signer(self, app):
+        return Signer(app.secret_key, salt="server-side-session", key_derivation="hmac")
+
+    def _lifetime(self, app):
+        return app.permanent_session_lifetime.total_seconds()
+
+    def open_session(self, app, request):
+        self._ensure_sweeper()
+        sid = request.cookies.get(self.get_cookie_name(app))
+        if sid and self.use_signer:
+            try:
+                sid = self._signer(app).unsign(sid).decode()
+            except BadSignature:
+                sid = None
+
+        if sid:
+            start = time.perf_counter()
+            try:
+                row = self.store.load(self.key_prefix + sid)
+            except sqlite3.Error as e:
+                print(f"[session_store] Load failed: {e}")
+                row = None
+            metrics.observe("session_store.load", time.perf_counter() - start)
+            if row is not None:
+                try:
+                    data = self.serializer.loads(row[0])
+                    return ServerSideSession(data, sid=sid, expiry=row[1])
+                except ValueError:
+                    pass
+
+        return ServerSideSession(sid=secrets.token_urlsafe(32), new=True)
+
+    def save_session(self, app, session, response):
+        name = self.get_cookie_name(app)
+        domain = self.get_cookie_domain(app)
+        path = self.get_cookie_path(app)
+        key = self.key_prefix + session.sid
+
+        if not session:
+            if session.modified:
+                try:
+                    self.store.delete(key)
+                except sqlite3.Error as e:
+                    # The row expires on its own; dropping the cookie still logs the user out
+                    print(f"[session_store] Delete failed: {e}")
+                response.delete_cookie(name, domain=domain, path=path)
+            return
+
+        now = time.time()
+        lifetime = self._lifetime(app)
+        stale = session.expiry is not None and session.expiry - now < lifetime / 2
+        if not (session.modified or stale):
+            return
+
+        start = time.perf_counter()
+        try:
+            self.store.save(key, self.serializer.dumps(dict(session)), now + lifetime)
+        except sqlite3.Error as e:
+            print(f"[session_store] Save failed: {e}")
+            return
+        finally:
+            metrics.observe("session_store.save", time.perf_counter() - start)
+
+        sid = session.sid
+        if self.use_signer:
+            sid = self._signer(app).sign(sid).decode()
+        response.set_cookie(
+            name,
+            sid,
+            expires=self.get_expiration_time(app, session),
+            httponly=self.get_cookie_httponly(app),
+            domain=domain,
+            path=path,
+            secure=self.get_cookie_secure(app),
+            samesite=self.get_cookie_samesite(app),
+        )
+
+    def _ensure_sweeper(self):
+        # One sweeper per worker process; started lazily so it survives gunicorn's fork.
+        # Checked again under the lock so concurrent first requests start only one.
+        if self._sweeper_pid == os.getpid():
+            return
+        with self._sweeper_lock:
+            if self._sweeper_pid == os.getpid():
+                return
+            threading.Thread(target=self._sweep_forever, name="session-sweeper", daemon=True).start()
+            self._sweeper_pid = os.getpid()
+
+    def _sweep_forever(self):
+        while True:
+            time.sleep(self.sweep_interval)
+            start = time.perf_counter()
+            try:
+                removed = self.sweep_batch
+                while removed == self.sweep_batch:
+                    removed = self.store.sweep(self.sweep_batch)
+                    metrics.incr("session_store.swept", removed)
+            except sqlite3.Error as e:
+                print(f"[session_store] Sweep failed: {e}")
+            metrics.observe("session_store.sweep", time.perf_counter() - start)
+
+
+def init_session_store(app):
+    """Install the server-side session interface selected by ``SESSION_TYPE``."""
+    if app.config["SESSION_TYPE"] == "memory":
+        store = MemorySessionStore()
+    else:
+        os.makedirs(os.path.dirname(app.config["SESSION_SQLITE_PATH"]), exist_ok=True)
+        store = SqliteSessionStore(app.config["SESSION_SQLITE_PATH"])
+
+    app.session_interface = StoreSessionInterface(
+        store,
+        key_prefix=app.config.get("SESSION_KEY_PREFIX", "session:"),
+        use_signer=app.config.get("SESSION_USE_SIGNER", True),
+        sweep_interval=app.config.get("SESSION_SWEEP_INTERVAL", 300),
+    )
@@ -0,0 +1,109 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# app.py builds an app on import, which needs these before the first import
+os.environ.setdefault("SECRET_KEY", "test-secret")
+os.environ.setdefault("SESSION_TYPE", "memory")
+
+from app import create_app  # noqa: E402
+from extensions import db as _db  # noqa: E402
+
+
+@pytest.fixture
+def app(tmp_path):
+    from routes.entitlements import _entitlements
+    from routes.identity import _identities
+    from routes.playback import _lecture_courses
+    app = create_app({
+        "TESTING": True,
+        "SQLALCHEMY_DATABASE_URI": "sqlite://",
+        "CERTIFICATE_AUTOSTART": False,
+        "RESPONSE_CACHE_PATH": str(tmp_path / "response_cache.db"),
+    })
+    with app.app_context():
+        _db.create_all()
+        yield app
+        # Write buffered heartbeats now; the exit hook would find the tables gone
+        if "playback_buffer" in app.extensions:
+            app.extensions["playback_buffer"].flush()
+        _db.session.remove()
+        _db.drop_all()
+    # Module-level caches outlive the app and would leak ids between tests
+    for cache in (_entitlements, _identities, _lecture_courses):
+        cache.clear()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture
+def db(app):
+    return _db
+
+
+@pytest.fixture
+def make_user(db):
+    from models import User
+
+    def make_user(username, role="student"):
+        user = User(pi_uid=f"uid-{username}", username=username, role=role)
+        db.session.add(user)
+        db.session.commit()
+        return user
+    return make_user
+
+
+@pytest.fixture
+def token(app):
+    """Session token for a user, accepted by verify_pi_token without calling the Pi API."""
+    from routes.session_tokens import issue_session_token
+    return issue_session_token
+
+
+@pytest.fixture
+def make_course(db, make_user):
+    """Create a published course with ``sections`` sections of ``lectures`` lectures each."""
+    from models import Course, Lecture, Section
+    from routes.course_tree import refresh_outline
+
+    def make_course(title="Course", sections=2, lectures=3, instructor=None, **fields):
+        instructor = instructor or make_user(f"instructor-{title}", role="instructor")
+        fields.setdefault("is_published", True)
+        course = Course(title=title, instructor_id=instructor.id, **fields)
+        db.session.add(course)
+        db.session.flush()
+        for s in range(sections):
+            section = Section(course_id=course.id, title=f"Section {s}", order=s)
+            db.session.add(section)
+            db.session.flush()
+            for l in range(lectures):
+                db.session.add(Lecture(section_id=section.id, title=f"Lecture {s}.{l}", order=l, duration=60))
+        refresh_outline(course.id)
+        db.session.commit()
+        return course
+    return make_course
+
+
+@pytest.fixture
+def count_queries(db):
+    """Run ``fn`` and return ``(result, number of SQL statements it executed)``."""
+    from sqlalchemy import event
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    def count_queries(fn):
+        statements.clear()
+        event.listen(db.engine, "before_cursor_execute", before_cursor_execute)
+        try:
+            result = fn()
+        finally:
+            event.remove(db.engine, "before_cursor_execute", before_cursor_execute)
+        return result, len(statements)
+    return count_queries
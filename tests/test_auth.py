@@ -0,0 +1,17 @@
+import pytest
+
+
+@pytest.mark.parametrize("access_token", [123, ["lp1.x"], {"token": "x"}, True])
+def test_non_string_tokens_are_rejected_not_crashed(client, make_course, access_token):
+    course = make_course()
+    response = client.post(f"/api/progress/{course.id}", json={"accessToken": access_token})
+    assert response.status_code == 401
+
+    response = client.post("/api/certificates/eligible", json={"accessToken": access_token})
+    assert response.status_code == 401
+
+
+def test_session_token_authenticates(client, make_course, make_user, token):
+    course = make_course()
+    response = client.post(f"/api/progress/{course.id}", json={"accessToken": token(make_user("learner"))})
+    assert response.status_code == 200
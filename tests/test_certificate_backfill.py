@@ -0,0 +1,93 @@
+import pytest
+from sqlalchemy import insert
+
+from routes import certificate_backfill
+from routes.certificate_backfill import backfill_certificates
+
+
+@pytest.fixture
+def completed(db, make_course, make_user):
+    """Three learners who completed one course: ``(course, [users])``."""
+    from models import Lecture, Progress
+    course = make_course(sections=1, lectures=2)
+    users = [make_user(f"learner{i}") for i in range(3)]
+    for user in users:
+        for lecture in Lecture.query.all():
+            db.session.add(Progress(user_id=user.id, course_id=course.id, lecture_id=lecture.id, completed=True))
+    db.session.commit()
+    return course, users
+
+
+@pytest.fixture
+def uploads(monkeypatch):
+    uploaded = []
+
+    def upload(file_name, pdf):
+        uploaded.append(file_name)
+        return f"https://cdn.example/{file_name}"
+    monkeypatch.setattr(certificate_backfill, "upload_certificate", upload)
+    return uploaded
+
+
+def _run(tmp_path, **options):
+    return backfill_certificates(str(tmp_path / "checkpoint.json"), render_workers=1, upload_workers=2, **options)
+
+
+def _issue(engine, user_id, course_id):
+    # Written on its own connection, as the job queue would
+    from models import Certificate
+    with engine.begin() as conn:
+        conn.execute(insert(Certificate.__table__).values(user_id=user_id, course_id=course_id, pdf_url="queue"))
+
+
+def test_backfill_issues_missing_certificates(tmp_path, db, completed, uploads):
+    from models import Certificate
+    course, users = completed
+    _issue(db.engine, users[0].id, course.id)
+
+    assert _run(tmp_path) == (2, 0, 0)
+    assert sorted(uploads) == [f"certificate_{u.id}_{course.id}.pdf" for u in users[1:]]
+    assert Certificate.query.count() == 3
+
+
+def test_pairs_issued_by_the_queue_are_neither_uploaded_nor_counted(tmp_path, db, completed, uploads, monkeypatch):
+    from models import Certificate
+    course, users = completed
+    engine = db.engine
+    read_page = certificate_backfill._eligible_page
+
+    def page_then_queue_issues(*args):
+        page = read_page(*args)
+        if page:
+            _issue(engine, users[0].id, course.id)
+        return page
+    monkeypatch.setattr(certificate_backfill, "_eligible_page", page_then_queue_issues)
+
+    assert _run(tmp_path) == (2, 0, 0)
+    assert f"certificate_{users[0].id}_{course.id}.pdf" not in uploads
+    assert Certificate.query.filter_by(user_id=users[0].id).one().pdf_url == "queue"
+
+
+def test_conflict_during_upload_is_skipped_not_fatal(tmp_path, db, completed, monkeypatch):
+    from models import Certificate
+    course, users = completed
+    engine, user_id, course_id = db.engine, users[1].id, course.id
+
+    def upload(file_name, pdf):
+        # Runs on an upload thread, outside the app context
+        if file_name == f"certificate_{user_id}_{course_id}.pdf":
+            _issue(engine, user_id, course_id)
+        return f"https://cdn.example/{file_name}"
+    monkeypatch.setattr(certificate_backfill, "upload_certificate", upload)
+
+    assert _run(tmp_path) == (2, 0, 0)
+    assert Certificate.query.count() == 3
+    assert Certificate.query.filter_by(user_id=users[1].id).one().pdf_url == "queue"
+
+
+def test_reissues_are_counted_apart(tmp_path, db, completed, uploads):
+    course, users = completed
+    _issue(db.engine, users[0].id, course.id)
+
+    assert _run(tmp_path, regenerate=True) == (2, 1, 0)
+    assert len(uploads) == 3
@@ -0,0 +1,33 @@
+import threading
+
+from routes import certificate_jobs
+from routes.certificate_jobs import CertificateQueue
+
+
+def test_concurrent_first_requests_start_one_dispatcher(app, monkeypatch):
+    started, pools = [], []
+
+    class Thread:
+        def __init__(self, target, name, daemon):
+            self.name = name
+
+        def start(self):
+            started.append(self.name)
+
+    queue = CertificateQueue(app)
+    barrier = threading.Barrier(8)
+
+    def first_request():
+        barrier.wait()
+        queue.start()
+
+    # Create the request threads before Thread is replaced for the dispatcher
+    workers = [threading.Thread(target=first_request) for _ in range(8)]
+    monkeypatch.setattr(certificate_jobs.threading, "Thread", Thread)
+    monkeypatch.setattr(certificate_jobs, "ThreadPoolExecutor", lambda **kwargs: pools.append(kwargs) or object())
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    assert started == ["certificate-dispatcher"]
+    assert len(pools) == 1
@@ -0,0 +1,43 @@
+from routes.response_cache import invalidate_course
+
+
+def test_matching_etag_gets_304_without_running_the_view(client, make_course, count_queries):
+    course = make_course()
+    url = f"/api/courses/sections/{course.id}"
+
+    first = client.get(url)
+    assert first.status_code == 200
+    etag = first.headers["ETag"]
+    assert "no-cache" in first.headers["Cache-Control"]
+
+    response, queries = count_queries(lambda: client.get(url, headers={"If-None-Match": etag}))
+    assert response.status_code == 304
+    assert response.headers["ETag"] == etag
+    assert response.data == b""
+    assert queries == 0
+
+
+def test_stale_etag_gets_the_full_body(client, make_course):
+    course = make_course()
+    url = f"/api/courses/{course.id}"
+    etag = client.get(url).headers["ETag"]
+
+    response = client.get(url, headers={"If-None-Match": '"something-else"'})
+    assert response.status_code == 200
+    assert response.headers["ETag"] == etag
+    assert response.get_json()["id"] == course.id
+
+
+def test_course_change_invalidates_the_etag(client, db, make_course):
+    course = make_course(title="Before")
+    url = f"/api/courses/{course.id}"
+    etag = client.get(url).headers["ETag"]
+
+    course.title = "After"
+    db.session.commit()
+    invalidate_course(course.id)
+
+    response = client.get(url, headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["ETag"] != etag
+    assert response.get_json()["title"] == "After"
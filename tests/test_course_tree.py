@@ -0,0 +1,54 @@
+import json
+
+from routes.course_tree import load_course_tree
+
+
+def test_course_tree_query_count_is_constant(app, db, make_course, count_queries):
+    small_id = make_course("Small", sections=1, lectures=1).id
+    large_id = make_course("Large", sections=30, lectures=5).id
+    db.session.expunge_all()
+
+    (course, tree), small_queries = count_queries(lambda: load_course_tree(small_id))
+    assert len(tree) == 1
+    db.session.expunge_all()
+
+    (course, tree), large_queries = count_queries(lambda: load_course_tree(large_id))
+    assert len(tree) == 30
+    assert all(len(lectures) == 5 for _, lectures in tree)
+    assert small_queries == large_queries == 2
+
+
+def test_course_tree_is_ordered(app, db, make_course):
+    from models import Lecture, Section
+    course = make_course(sections=0)
+    late = Section(course_id=course.id, title="Late", order=2)
+    early = Section(course_id=course.id, title="Early", order=1)
+    db.session.add_all([late, early])
+    db.session.flush()
+    db.session.add_all([
+        Lecture(section_id=early.id, title="Second", order=2),
+        Lecture(section_id=early.id, title="First", order=1),
+    ])
+    db.session.commit()
+
+    _, tree = load_course_tree(course.id)
+    assert [section.title for section, _ in tree] == ["Early", "Late"]
+    assert [lecture.title for lecture in tree[0][1]] == ["First", "Second"]
+    assert tree[1][1] == []
+
+
+def test_curriculum_endpoints_use_constant_queries(client, db, make_course, count_queries):
+    small = make_course("Small", sections=1, lectures=1)
+    large = make_course("Large", sections=20, lectures=4)
+
+    counts = []
+    for course in (small, large):
+        response, queries = count_queries(lambda: client.get(f"/api/courses/sections/{course.id}"))
+        assert response.status_code == 200
+        counts.append(queries)
+    assert counts[0] == counts[1]
+
+    body = json.loads(response.data)
+    assert body["section_count"] == 20
+    assert body["lecture_count"] == 80
+    assert body["total_duration"] == 80 * 60
@@ -0,0 +1,66 @@
+from routes.eligibility import completed_courses, is_eligible
+
+
+def _complete(db, user, course, count=None):
+    from models import Lecture, Progress, Section
+    lectures = Lecture.query.join(Section).filter(Section.course_id == course.id).order_by(Lecture.id).all()
+    for lecture in lectures[:count]:
+        db.session.add(Progress(user_id=user.id, course_id=course.id, lecture_id=lecture.id, completed=True))
+    db.session.commit()
+
+
+def test_only_fully_completed_courses_are_eligible(db, make_course, make_user):
+    alice, bob = make_user("alice"), make_user("bob")
+    python, cooking = make_course("Python", sections=2, lectures=2), make_course("Cooking", sections=1, lectures=3)
+    empty = make_course("Empty", sections=0)
+    _complete(db, alice, python)
+    _complete(db, alice, cooking, count=2)
+    _complete(db, bob, cooking)
+
+    assert completed_courses([alice.id, bob.id]) == {alice.id: {python.id}, bob.id: {cooking.id}}
+    assert completed_courses([alice.id], course_ids=[cooking.id]) == {alice.id: set()}
+    assert is_eligible(alice.id, python.id)
+    assert not is_eligible(alice.id, cooking.id)
+    assert not is_eligible(alice.id, empty.id)
+
+
+def test_uncompleted_progress_rows_do_not_count(db, make_course, make_user):
+    from models import Progress
+    alice = make_user("alice")
+    course = make_course(sections=1, lectures=2)
+    _complete(db, alice, course)
+    Progress.query.filter_by(user_id=alice.id).first().completed = False
+    db.session.commit()
+
+    assert not is_eligible(alice.id, course.id)
+
+
+def test_new_lecture_revokes_eligibility(db, make_course, make_user):
+    from models import Lecture, Section
+    alice = make_user("alice")
+    course = make_course(sections=1, lectures=1)
+    _complete(db, alice, course)
+    assert is_eligible(alice.id, course.id)
+
+    section = Section.query.filter_by(course_id=course.id).one()
+    db.session.add(Lecture(section_id=section.id, title="Bonus", order=5))
+    db.session.commit()
+    assert not is_eligible(alice.id, course.id)
+
+
+def test_eligible_endpoint_lists_claimable_courses(client, db, make_course, make_user, token):
+    from models import Certificate
+    alice = make_user("alice")
+    issued, claimable = make_course("Issued", sections=1, lectures=1), make_course("Claimable", sections=1, lectures=2)
+    make_course("Untouched", sections=1, lectures=1)
+    _complete(db, alice, issued)
+    _complete(db, alice, claimable)
+    db.session.add(Certificate(user_id=alice.id, course_id=issued.id, pdf_url="https://cdn.example/cert.pdf"))
+    db.session.commit()
+
+    response = client.post("/api/certificates/eligible", json={"accessToken": token(alice)})
+    assert response.status_code == 200
+    assert response.get_json()["courses"] == [
+        {"course_id": issued.id, "course_title": "Issued", "certificate_url": "https://cdn.example/cert.pdf", "claimable": False},
+        {"course_id": claimable.id, "course_title": "Claimable", "certificate_url": None, "claimable": True},
+    ]
@@ -0,0 +1,12 @@
+def test_metrics_are_hidden_without_a_token(client):
+    assert client.get("/api/metrics").status_code == 404
+
+
+def test_metrics_require_the_configured_token(app, client):
+    app.config["METRICS_TOKEN"] = "scrape-secret"
+    assert client.get("/api/metrics").status_code == 401
+    assert client.get("/api/metrics", headers={"Authorization": "Bearer wrong"}).status_code == 401
+
+    response = client.get("/api/metrics", headers={"Authorization": "Bearer scrape-secret"})
+    assert response.status_code == 200
+    assert "certificate_queue" in response.get_json()
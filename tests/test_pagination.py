@@ -0,0 +1,78 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+
+def _pages(client, url):
+    """Follow ``next_cursor`` from ``url`` and return the list of pages."""
+    pages, cursor = [], None
+    while True:
+        response = client.get(url + (f"&cursor={cursor}" if cursor else ""))
+        assert response.status_code == 200
+        body = response.get_json()
+        pages.append(body)
+        cursor = body["next_cursor"]
+        if cursor is None:
+            return pages
+
+
+def test_catalog_pages_cover_every_published_course_once(client, db, make_course, make_user):
+    instructor = make_user("teacher", role="instructor")
+    start = datetime(2026, 1, 1)
+    courses = [
+        make_course(f"Course {i}", sections=0, instructor=instructor, created_at=start + timedelta(days=i // 2))
+        for i in range(7)
+    ]
+    make_course("Draft", sections=0, instructor=instructor, is_published=False, created_at=start)
+
+    pages = _pages(client, "/api/courses/?limit=3")
+    ids = [card["id"] for page in pages for card in page["courses"]]
+
+    assert [len(page["courses"]) for page in pages] == [3, 3, 1]
+    # Newest first; courses created at the same moment are ordered by id
+    expected = sorted(courses, key=lambda c: (c.created_at, c.id), reverse=True)
+    assert ids == [c.id for c in expected]
+    assert "description" not in pages[0]["courses"][0]
+
+
+def test_catalog_rejects_a_tampered_cursor(client):
+    assert client.get("/api/courses/?cursor=not-a-cursor").status_code == 400
+
+
+def test_catalog_search_pages_by_offset(client, make_course, make_user):
+    instructor = make_user("teacher", role="instructor")
+    for i in range(5):
+        make_course(f"Python {i}", sections=0, instructor=instructor)
+    make_course("Cooking", sections=0, instructor=instructor)
+
+    pages = _pages(client, "/api/courses/?q=python&limit=2")
+    titles = [card["title"] for page in pages for card in page["courses"]]
+    assert sorted(titles) == [f"Python {i}" for i in range(5)]
+
+
+@pytest.fixture
+def reviewed_course(db, make_course, make_user):
+    from models import Rating
+    course = make_course("Reviewed", sections=0)
+    start = datetime(2026, 1, 1)
+    for i in range(5):
+        user = make_user(f"reviewer{i}")
+        # Pairs of reviews share a timestamp so the id tie-break is exercised
+        db.session.add(Rating(user_id=user.id, course_id=course.id, rating=i + 1, created_at=start + timedelta(hours=i // 2)))
+    db.session.commit()
+    return course
+
+
+def test_reviews_pages_are_newest_first_without_gaps(client, db, reviewed_course):
+    from models import Rating
+    pages = _pages(client, f"/api/ratings/get?course_id={reviewed_course.id}&limit=2")
+    reviewers = [review["user_id"] for page in pages for review in page["ratings"]]
+
+    expected = Rating.query.order_by(Rating.created_at.desc(), Rating.id.desc()).all()
+    assert reviewers == [r.user_id for r in expected]
+    assert [len(page["ratings"]) for page in pages] == [2, 2, 1]
+
+
+def test_reviews_reject_a_tampered_cursor(client, reviewed_course):
+    response = client.get(f"/api/ratings/get?course_id={reviewed_course.id}&cursor=abc")
+    assert response.status_code == 400
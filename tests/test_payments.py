@@ -0,0 +1,16 @@
+from routes.entitlements import has_access
+
+
+def test_confirm_records_the_purchase_without_granting_access(app, client, db, make_course, make_user):
+    from models import Course, Purchase
+    buyer = make_user("buyer")
+    course = make_course(price_pi=5.0)
+    with client.session_transaction() as session:
+        session["user_id"] = buyer.id
+
+    response = client.post("/api/payments/confirm", json={"course_id": course.id, "tx_id": "unverified"})
+    assert response.status_code == 201
+
+    assert Purchase.query.filter_by(user_id=buyer.id, course_id=course.id, status="confirmed").count() == 1
+    assert has_access(buyer.id, [course.id]) == {course.id: False}
+    assert db.session.get(Course, course.id).trending_score == 0
@@ -0,0 +1,71 @@
+import threading
+
+import pytest
+
+from routes import playback
+from routes.playback import PlaybackBuffer
+
+
+@pytest.fixture
+def heartbeat(client, make_course, make_user, token):
+    from models import Lecture
+    make_course(sections=1, lectures=1)
+    lecture_id = Lecture.query.first().id
+    access_token = token(make_user("viewer"))
+
+    def heartbeat(**fields):
+        body = {"accessToken": access_token, "lecture_id": lecture_id, "position": 12.5, "duration": 60}
+        body.update(fields)
+        return client.post("/api/progress/heartbeat", json=body)
+    return heartbeat
+
+
+def test_heartbeat_is_buffered(heartbeat):
+    assert heartbeat().status_code == 202
+
+
+@pytest.mark.parametrize("fields", [
+    {"position": float("nan")},
+    {"position": float("inf")},
+    {"duration": float("inf")},
+    {"lecture_id": float("inf")},
+    {"position": -1},
+    {"accessToken": 123},
+    {"accessToken": ["token"]},
+])
+def test_heartbeat_rejects_invalid_numbers(heartbeat, fields):
+    assert heartbeat(**fields).status_code == 400
+
+
+@pytest.mark.parametrize("body", [b"[1, 2]", b"42", b"not json", b'{"accessToken": 123, "lecture_id": 1, "position": 1}'])
+def test_heartbeat_rejects_non_object_bodies(client, body):
+    response = client.post("/api/progress/heartbeat", data=body, content_type="text/plain")
+    assert response.status_code == 400
+
+
+def test_concurrent_first_heartbeats_start_one_flusher(app, monkeypatch):
+    started = []
+
+    class Thread:
+        def __init__(self, target, name, daemon):
+            self.name = name
+
+        def start(self):
+            started.append(self.name)
+
+    buffer = PlaybackBuffer(app)
+    barrier = threading.Barrier(8)
+
+    def first_heartbeat(user_id):
+        barrier.wait()
+        buffer.record(user_id, 1, 1, 10.0)
+
+    # Create the request threads before Thread is replaced for the flusher
+    workers = [threading.Thread(target=first_heartbeat, args=(i,)) for i in range(8)]
+    monkeypatch.setattr(playback.threading, "Thread", Thread)
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    assert started == ["playback-flusher"]
+    assert buffer.pending_count() == 8
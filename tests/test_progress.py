@@ -0,0 +1,96 @@
+import pytest
+
+from routes.progress_summary import adjust_total_lectures
+
+
+@pytest.fixture
+def learner(make_user):
+    return make_user("learner")
+
+
+def _lecture_ids(course):
+    from models import Lecture, Section
+    return [
+        lecture_id for lecture_id, in
+        Lecture.query.join(Section).filter(Section.course_id == course.id)
+        .order_by(Section.order, Lecture.order).with_entities(Lecture.id)
+    ]
+
+
+def _progress(client, token, course):
+    response = client.post(f"/api/progress/{course.id}", json={"accessToken": token})
+    assert response.status_code == 200
+    return response.get_json()
+
+
+def test_batch_marks_lectures_and_counts_them_once(client, make_course, learner, token):
+    course = make_course(sections=2, lectures=3)
+    lectures = _lecture_ids(course)
+    access_token = token(learner)
+
+    response = client.patch("/api/progress/batch", json={"accessToken": access_token, "lecture_ids": lectures[:4] + [999]})
+    assert response.status_code == 200
+    assert response.get_json()["skipped"] == [999]
+
+    # Marking the same lectures again must not move the counters
+    client.patch("/api/progress/batch", json={"accessToken": access_token, "lecture_ids": lectures[:4]})
+    client.patch("/api/progress/update", json={"accessToken": access_token, "lecture_id": lectures[0]})
+
+    progress = _progress(client, access_token, course)
+    assert progress["completed_lectures"] == 4
+    assert progress["total_lectures"] == 6
+    assert progress["progress_percentage"] == 67
+    assert sorted(progress["completed_lecture_ids"]) == sorted(lectures[:4])
+
+
+def test_unmarking_decrements_only_completed_lectures(client, make_course, learner, token):
+    course = make_course(sections=1, lectures=4)
+    lectures = _lecture_ids(course)
+    access_token = token(learner)
+    client.patch("/api/progress/batch", json={"accessToken": access_token, "lecture_ids": lectures[:2]})
+
+    client.patch("/api/progress/batch", json={"accessToken": access_token, "lecture_ids": lectures, "completed": False})
+    assert _progress(client, access_token, course)["completed_lectures"] == 0
+
+    client.patch("/api/progress/batch", json={"accessToken": access_token, "lecture_ids": lectures[1:3]})
+    assert _progress(client, access_token, course)["completed_lectures"] == 2
+
+
+def test_batch_spanning_courses_updates_each_summary(client, make_course, learner, token):
+    first, second = make_course("First", sections=1, lectures=2), make_course("Second", sections=1, lectures=2)
+    access_token = token(learner)
+    lectures = _lecture_ids(first)[:1] + _lecture_ids(second)
+
+    response = client.patch("/api/progress/batch", json={"accessToken": access_token, "lecture_ids": lectures})
+    assert response.get_json()["course_ids"] == sorted([first.id, second.id])
+    assert _progress(client, access_token, first)["completed_lectures"] == 1
+    assert _progress(client, access_token, second)["completed_lectures"] == 2
+
+
+def test_lecture_total_follows_curriculum_changes(app, db, client, make_course, learner, token):
+    course = make_course(sections=1, lectures=2)
+    access_token = token(learner)
+    client.patch("/api/progress/batch", json={"accessToken": access_token, "lecture_ids": _lecture_ids(course)})
+
+    adjust_total_lectures(course.id, 3)
+    db.session.commit()
+    progress = _progress(client, access_token, course)
+    assert (progress["completed_lectures"], progress["total_lectures"]) == (2, 5)
+
+
+def test_progress_without_activity_counts_lectures(client, make_course, learner, token):
+    course = make_course(sections=2, lectures=2)
+    progress = _progress(client, token(learner), course)
+    assert (progress["completed_lectures"], progress["total_lectures"], progress["last_lecture_id"]) == (0, 4, None)
+
+
+def test_batch_resume_point_is_the_last_lecture_in_the_request(client, make_course, learner, token):
+    course = make_course(sections=2, lectures=2)
+    lectures = _lecture_ids(course)
+    access_token = token(learner)
+
+    client.patch("/api/progress/batch", json={"accessToken": access_token, "lecture_ids": [lectures[3], lectures[0]]})
+    assert _progress(client, access_token, course)["last_lecture_id"] == lectures[0]
+
+    client.patch("/api/progress/batch", json={"accessToken": access_token, "lecture_ids": [lectures[1], lectures[2]]})
+    assert _progress(client, access_token, course)["last_lecture_id"] == lectures[2]
@@ -0,0 +1,59 @@
+import sqlite3
+import threading
+
+import session_store
+from session_store import MemorySessionStore, StoreSessionInterface
+
+
+def test_concurrent_first_requests_start_one_sweeper(monkeypatch):
+    started = []
+
+    class Thread:
+        def __init__(self, target, name, daemon):
+            self.name = name
+
+        def start(self):
+            started.append(self.name)
+
+    interface = StoreSessionInterface(MemorySessionStore())
+    barrier = threading.Barrier(8)
+
+    def first_request():
+        barrier.wait()
+        interface._ensure_sweeper()
+
+    # Create the request threads before Thread is replaced for the sweeper
+    workers = [threading.Thread(target=first_request) for _ in range(8)]
+    monkeypatch.setattr(session_store.threading, "Thread", Thread)
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    assert started == ["session-sweeper"]
+
+
+class BrokenStore(MemorySessionStore):
+    def delete(self, sid):
+        raise sqlite3.OperationalError("database is locked")
+
+
+def test_logout_survives_a_failed_delete(app):
+    app.session_interface = StoreSessionInterface(BrokenStore())
+
+    @app.route("/_login")
+    def login():
+        from flask import session
+        session["user_id"] = 1
+        return "ok"
+
+    @app.route("/_logout")
+    def logout():
+        from flask import session
+        session.clear()
+        return "ok"
+
+    client = app.test_client()
+    client.get("/_login")
+    response = client.get("/_logout")
+    assert response.status_code == 200
+    assert "my_session=;" in response.headers["Set-Cookie"]
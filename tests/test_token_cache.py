@@ -0,0 +1,40 @@
+import time
+
+import pytest
+
+from routes import utils
+from routes.utils import TokenCache
+
+
+def test_shared_hit_keeps_the_remaining_ttl(tmp_path):
+    path = str(tmp_path / "tokens.db")
+    writer, reader = TokenCache(ttl=300, shared_path=path), TokenCache(ttl=300, shared_path=path)
+    writer.shared.set("key", {"uid": "u1", "username": "alice"}, 2)
+
+    assert reader.get("key") == {"uid": "u1", "username": "alice"}
+    _, expires_at = reader.local._data["key"]
+    assert expires_at - time.monotonic() <= 2
+
+
+class _Response:
+    def __init__(self, status_code, data=None):
+        self.status_code = status_code
+        self._data = data or {}
+
+    def json(self):
+        return self._data
+
+
+@pytest.mark.parametrize("status, cached", [(401, True), (403, True), (400, False), (429, False), (503, False)])
+def test_only_rejections_are_negative_cached(app, monkeypatch, status, cached):
+    calls = []
+
+    class Client:
+        def me(self, access_token):
+            calls.append(access_token)
+            return _Response(status)
+
+    monkeypatch.setattr(utils, "pi_client", Client)
+    assert utils.verify_pi_token("pi-token") is None
+    assert utils.verify_pi_token("pi-token") is None
+    assert len(calls) == (1 if cached else 2)